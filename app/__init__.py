@@ -1,6 +1,8 @@
+import os
 from flask import Flask
 from flask_sock import Sock
 from .utils.db import ensure_db
+from .utils.models import init_db
 from math import sin, cos, acos
 
 def create_app():
@@ -33,6 +35,9 @@ def create_app():
     app.register_blueprint(rooms_bp, url_prefix='/')
     app.register_blueprint(main_bp, url_prefix='/main')
 
+    # Register command line commands (flask --app run <command>)
+    from .commands import register_commands
+    register_commands(app)
 
     # Startup function
     with app.app_context():
@@ -44,4 +49,8 @@ def create_app():
         # Check if the database exists. If not, create it using schema.sql
         ensure_db()
 
+        # Bring the hands database to the current schema (indexes, search index, statistics aggregates)
+        if os.path.exists(app.config['HANDS_DATABASE']):
+            init_db(app.config['HANDS_DATABASE'])
+
     return app
@@ -0,0 +1,137 @@
+import base64
+import hashlib
+import os
+import time
+import urllib.request
+import click
+from flask import current_app
+from app.utils.models import (init_db, save_hands_stream, explain_statistics_queries, convert_ohh_data, get_db_connection,
+                              full_update_players_hands)
+
+
+def find_ohh_files(paths):
+    """Returns the OHH files given directly or contained (recursively) in the given directories."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files += [os.path.join(root, name) for name in sorted(names) if name.lower().endswith(".ohh")]
+        else:
+            files.append(path)
+    return files
+
+
+@click.command("import-hands")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--db", "db_path", default=None, help="Hands database. Defaults to HANDS_DATABASE.")
+@click.option("--workers", type=int, default=None, help="Number of parsing processes. Defaults to the number of cores.")
+@click.option("--chunk-size", type=int, default=500, show_default=True, help="Number of hands parsed and committed together.")
+def import_hands_command(paths, db_path, workers, chunk_size):
+    """Streams the hands of OHH files (or directories of OHH files) into the hands database."""
+    db_path = db_path or current_app.config['HANDS_DATABASE']
+    files = find_ohh_files(paths)
+    if not init_db(db_path):
+        return
+
+    start = time.perf_counter()
+    def progress(count):
+        click.echo(f"\r{count} hands imported ({count / (time.perf_counter() - start):.0f} hands/s)", nl=False)
+
+    pragmas = current_app.config.get('IMPORT_PRAGMAS') # Opt-in bulk load PRAGMAs, restored after the import
+    count = save_hands_stream(files, db_path, chunk_size=chunk_size, workers=workers, progress=progress, pragmas=pragmas,
+                              compress_ohh=current_app.config.get('COMPRESS_OHH_DATA', True),
+                              allin_ev_samples=current_app.config.get('ALLIN_EV_SAMPLES'))
+    click.echo(f"\n{count} hands imported from {len(files)} file(s) in {time.perf_counter() - start:.1f} s")
+
+
+@click.command("migrate-hands-db")
+@click.option("--db", "db_path", default=None, help="Hands database. Defaults to HANDS_DATABASE.")
+def migrate_hands_db_command(db_path):
+    """Brings the hands database to the current schema (tables, indexes) and refreshes the planner statistics.
+    Hands stored more than once by older imports are removed, keeping the first one."""
+    db_path = db_path or current_app.config['HANDS_DATABASE']
+    if not init_db(db_path, remove_duplicates=True):
+        raise SystemExit(1)
+    with get_db_connection(db_path) as conn:
+        conn.execute("ANALYZE")
+    click.echo(f"{db_path} is up to date.")
+
+
+@click.command("convert-ohh-data")
+@click.option("--db", "db_path", default=None, help="Hands database. Defaults to HANDS_DATABASE.")
+@click.option("--compress/--decompress", default=True, help="Store hands as compressed JSON (default) or as JSON text.")
+@click.option("--vacuum/--no-vacuum", default=True, help="Run VACUUM afterwards to shrink the file.")
+def convert_ohh_data_command(db_path, compress, vacuum):
+    """Rewrites the stored hands (ohh_data) in the compressed or the text format."""
+    db_path = db_path or current_app.config['HANDS_DATABASE']
+    size = os.path.getsize(db_path)
+    count = convert_ohh_data(db_path, compress, progress=lambda count: click.echo(f"\r{count} hands converted", nl=False))
+    if vacuum:
+        with get_db_connection(db_path) as conn:
+            conn.execute("VACUUM")
+    click.echo(f"\n{count} hands converted, database size {size / 1e6:.1f} MB -> {os.path.getsize(db_path) / 1e6:.1f} MB")
+
+
+@click.command("update-players-hands")
+@click.option("--db", "db_path", default=None, help="Hands database. Defaults to HANDS_DATABASE.")
+@click.option("--workers", type=int, default=None, help="Number of parsing processes. Defaults to the number of cores.")
+@click.option("--chunk-size", type=int, default=1000, show_default=True, help="Number of hands parsed and committed together.")
+def update_players_hands_command(db_path, workers, chunk_size):
+    """Reparses every stored hand to recompute players_hands, after a change of the statistics of the parser.
+    The statistics pages keep working on the previous players_hands until the new one replaces it."""
+    db_path = db_path or current_app.config['HANDS_DATABASE']
+    if not init_db(db_path):
+        raise SystemExit(1)
+
+    start = time.perf_counter()
+    def progress(count, total):
+        click.echo(f"\r{count}/{total} hands parsed ({count / (time.perf_counter() - start):.0f} hands/s)", nl=False)
+
+    count = full_update_players_hands(db_path, chunk_size=chunk_size, workers=workers, progress=progress,
+                                      allin_ev_samples=current_app.config.get('ALLIN_EV_SAMPLES'))
+    click.echo(f"\n{count} hands parsed in {time.perf_counter() - start:.1f} s")
+
+
+@click.command("explain-queries")
+@click.option("--db", "db_path", default=None, help="Hands database. Defaults to HANDS_DATABASE.")
+def explain_queries_command(db_path):
+    """Prints the query plans of the statistics queries. Exits with an error if one of them scans a whole table."""
+    db_path = db_path or current_app.config['HANDS_DATABASE']
+    scans = 0
+    for name, (lines, full_scans) in explain_statistics_queries(db_path).items():
+        click.echo(name)
+        for line in lines:
+            click.echo(f"  {'!! ' if line in full_scans else ''}{line}")
+        scans += len(full_scans)
+    if scans:
+        click.echo(f"{scans} full table scan(s) found.", err=True)
+        raise SystemExit(1)
+
+
+@click.command("vendor-chartjs")
+def vendor_chartjs_command():
+    """Downloads Chart.js from CHARTJS_URL into app/static/js, where the statistics page loads it from.
+    Prints its integrity hash, to set as CHARTJS_INTEGRITY to load it from the CDN instead. When CHARTJS_INTEGRITY is
+    already set, the download is checked against it."""
+    with urllib.request.urlopen(current_app.config['CHARTJS_URL'], timeout=30) as response:
+        script = response.read()
+    integrity = f"sha384-{base64.b64encode(hashlib.sha384(script).digest()).decode()}"
+    expected = current_app.config.get('CHARTJS_INTEGRITY')
+    if expected and expected != integrity:
+        click.echo(f"{current_app.config['CHARTJS_URL']} doesn't match CHARTJS_INTEGRITY ({integrity}), not saved.", err=True)
+        raise SystemExit(1)
+    path = os.path.join(current_app.static_folder, "js", "chart.umd.js")
+    with open(path, "wb") as file:
+        file.write(script)
+    click.echo(f"{current_app.config['CHARTJS_URL']} saved to {path}")
+    click.echo(f"CHARTJS_INTEGRITY = '{integrity}'")
+
+
+def register_commands(app):
+    app.cli.add_command(import_hands_command)
+    app.cli.add_command(migrate_hands_db_command)
+    app.cli.add_command(explain_queries_command)
+    app.cli.add_command(convert_ohh_data_command)
+    app.cli.add_command(update_players_hands_command)
+    app.cli.add_command(vendor_chartjs_command)
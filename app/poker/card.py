@@ -3,11 +3,41 @@ def cards_string_to_list(string): #When cards are given as "AcKs" for example
         raise ValueError("Invalid length of string")
     return [string[i:i+2] for i in range(0, len(string), 2)]
 
+VALUES = "23456789TJQKA"
+SUITS = "cdhs"
+
 class Card:
+    """A card stored as the integer value_index * 4 + suit_index, the encoding used by app.utils.hand_evaluator.
+    The 52 cards are created once in CARDS, use Card.from_id to get them without any allocation."""
+    __slots__ = ("id",)
+
     def __init__(self, value, suit):
-        self.value = value
-        self.suit = suit
+        self.id = VALUES.index(value) * 4 + SUITS.index(suit)
+
+    @staticmethod
+    def from_id(card_id):
+        return CARDS[card_id]
+
+    @property
+    def value(self):
+        return VALUES[self.id >> 2]
+
+    @property
+    def suit(self):
+        return SUITS[self.id & 3]
+
+    def __int__(self):
+        return self.id
+
+    __index__ = __int__
+
+    def __eq__(self, other):
+        return isinstance(other, Card) and self.id == other.id
+
+    def __hash__(self):
+        return self.id
 
     def __repr__(self):
-        return f"{self.value}{self.suit}"
+        return VALUES[self.id >> 2] + SUITS[self.id & 3]
 
+CARDS = tuple(Card(value, suit) for value in VALUES for suit in SUITS)
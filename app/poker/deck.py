@@ -1,12 +1,26 @@
 import random
-from .card import Card
+from .card import CARDS
 
 class Deck:
+    """The 52 card ids, shuffled lazily : each draw picks a random card among the ones left (partial Fisher-Yates),
+    so shuffle only has to reset the number of cards left and a deck can be reused for every hand."""
     def __init__(self):
-        suits = ['c', 'd', 'h', 's']
-        values = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
-        self.cards = [Card(value, suit) for suit in suits for value in values]
-        random.shuffle(self.cards)
+        self.ids = list(range(52))
+        self.left = 52
+
+    def shuffle(self):
+        self.left = 52
 
     def draw(self, num=1):
-        return [self.cards.pop() for _ in range(num)]
+        cards = []
+        ids = self.ids
+        for _ in range(num):
+            index = random.randrange(self.left)
+            self.left -= 1
+            ids[index], ids[self.left] = ids[self.left], ids[index]
+            cards.append(CARDS[ids[self.left]])
+        return cards
+
+    @property
+    def cards(self):
+        return [CARDS[card_id] for card_id in self.ids[:self.left]]
@@ -13,7 +13,8 @@ class Hand:
                  big_blind_amount: Optional[Decimal] = None,
                  ante_amount: Optional[Decimal] = None,
                  start_date_utc: Optional[str] = None,
-                 hero_player_id: Optional[int] = None):
+                 hero_player_id: Optional[int] = None,
+                 minor_units: Optional[int] = None):
 
         self.table_name = table_name
         self.table_size = table_size
@@ -27,6 +28,7 @@ class Hand:
         self.small_blind_amount = small_blind_amount
         self.big_blind_amount = big_blind_amount
         self.ante_amount = ante_amount
+        self.minor_units = minor_units # Amounts are integer chips of 1/minor_units of the currency (see Table), converted at export
         self.flags = []
         self.players = []
         self.rounds: List[Round] = []
@@ -48,7 +50,7 @@ class Hand:
         """Return a JSON-compatible dictionary for the hand, using session info for context."""
         if self.small_blind_amount % 1 == 0 :
             Decimal = lambda x: str(int(x)) 
-        return { "ohh" :
+        ohh = { "ohh" :
                 {
                     "spec_version": session.spec_version,
                     "site_name": session.site_name,
@@ -70,3 +72,19 @@ class Hand:
                     "pots" : [pot_.to_json() for pot_ in self.pots]
                  }
                 }
+        if self.minor_units:
+            chips_to_currency(ohh["ohh"], self.minor_units)
+        return ohh
+
+# Keys of the OHH amounts
+AMOUNT_KEYS = {"small_blind_amount", "big_blind_amount", "ante_amount", "amount", "rake", "jackpot", "starting_stack",
+               "final_stack", "win_amount", "cashout_amount", "cashout_fee", "bonus_amount", "contributed_rake"}
+
+def chips_to_currency(data, minor_units):
+    """Converts in place the integer chips amounts of an OHH object to currency amounts."""
+    items = data.items() if isinstance(data, dict) else enumerate(data)
+    for key, value in items:
+        if isinstance(value, (dict, list)):
+            chips_to_currency(value, minor_units)
+        elif key in AMOUNT_KEYS and value is not None:
+            data[key] = Decimal(value) / minor_units
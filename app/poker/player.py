@@ -1,7 +1,7 @@
 from decimal import Decimal
 
 class Player:
-    def __init__(self, id : int, name: str, seat: int, starting_stack: Decimal = Decimal(100), final_stack: Decimal = None) :
+    def __init__(self, id : int, name: str, seat: int, starting_stack: Decimal = Decimal(100), final_stack: Decimal = None, zero = Decimal('0.00')) :
         self.id = id
         self.name = name
         self.starting_stack = starting_stack
@@ -12,8 +12,8 @@ class Player:
         self.cards = []
         self.status = 'Active'
         self.stack = starting_stack
-        self.bet_amount = Decimal('0.00')
-        self.socket = None
+        self.bet_amount = zero # Zero chips of the table, 0 when chips are integers
+        self.socket = None # Outbound queue of the table WebSocket, see rooms.connections
         self.mucks = True # By default, the player mucks its cards if possible 
         self.is_all_in = False
         
@@ -35,9 +35,9 @@ class Player:
         self.bonus_amount = bonus_amount
         self.contributed_rake = contributed_rake
 
-    def reset(self):
+    def reset(self, zero = Decimal('0.00')):
         self.cards = []
-        self.bet_amount = Decimal('0.00')
+        self.bet_amount = zero
         self.win_amount = None 
         self.mucks = True
         self.cashout_amount = None 
@@ -1,3 +1,3 @@
 from .table import Table
-from .circularlinkedlist import CircularLinkedList
+from .seatring import SeatRing
 
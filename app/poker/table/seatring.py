@@ -0,0 +1,119 @@
+class SeatRing:
+    """Players indexed by seat, ordered in a circle like the seats of the table.
+    The occupied seats are the bits of an integer mask and are linked to each other by the next and prev arrays, so
+    finding the next occupied seat, adding or removing a player don't walk through the other seats, and a copy is the
+    copy of three lists of table_size elements."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.data = [None] * size
+        self.mask = 0 # Bit i is set if seat i is occupied
+        self.next = [0] * size # Next and previous occupied seats of each occupied seat
+        self.prev = [0] * size
+        self.len = 0
+
+    def append(self, position: int, data):
+        bit = 1 << position
+        if self.mask & bit:
+            raise Exception("There is already and element at that position")
+        if self.mask:
+            next_position = self.next_position(position)
+            previous_position = self.prev[next_position]
+        else:
+            next_position = previous_position = position
+        self.next[previous_position] = position
+        self.prev[next_position] = position
+        self.next[position] = next_position
+        self.prev[position] = previous_position
+        self.data[position] = data
+        self.mask |= bit
+        self.len += 1
+
+    def remove(self, position: int):
+        bit = 1 << position
+        if self.mask == 0:
+            raise Exception("Error while removing, the list is empty")
+        if not self.mask & bit:
+            raise Exception("There isn't an element at that position")
+        self.next[self.prev[position]] = self.next[position]
+        self.prev[self.next[position]] = self.prev[position]
+        self.data[position] = None
+        self.mask &= ~bit
+        self.len -= 1
+
+    def next_position(self, position: int) -> int:
+        """Returns the first occupied seat after the given one, going back to the first seat after the last one."""
+        above = self.mask >> (position + 1) << (position + 1)
+        candidates = above if above else self.mask
+        return (candidates & -candidates).bit_length() - 1
+
+    # Get the next element after the given position. The position doesn't have to be in the list
+    def get_next(self, position: int, skip: int = 0):
+        if self.mask == 0:
+            raise Exception("Error while getting next, the list is empty")
+        if self.mask >> position & 1:
+            position = self.next[position]
+        else: # The seat was left, for example by the player who just folded
+            position = self.next_position(position)
+        for _ in range(skip):
+            position = self.next[position]
+        return self.data[position]
+
+    def get_index(self, position: int) -> int:
+        '''Return the index of the element at the given position'''
+        if not self.mask & (1 << position):
+            raise Exception("There isn't an element at that position")
+        return (self.mask & ((1 << position) - 1)).bit_count()
+
+    def __getitem__(self, position: int):
+        if not 0 <= position < self.size or not self.mask & (1 << position):
+            raise Exception("There isn't an element at that position")
+        return self.data[position]
+
+    def get(self, position: int, default = None):
+        try:
+            data = self.__getitem__(position)
+        except Exception:
+            return default
+        return data
+
+    def __setitem__(self, position: int, data):
+        return self.append(position, data)
+
+    # Get the list of the occupied positions, in increasing order
+    def positions(self):
+        return [position for position in range(self.size) if self.mask >> position & 1]
+
+    get_seats = positions
+
+    def __iter__(self):
+        for position in self.positions():
+            yield self.data[position]
+
+    iterator = __iter__
+
+    def __len__(self):
+        return self.len
+
+    def __str__(self):
+        strings = ["--------------------\n"]
+        if self.mask == 0:
+            strings.append("Empty")
+        for position in self.positions():
+            strings.append(f"Position {position}: {self.data[position]}\n")
+        strings.append("--------------------")
+        return "\n".join(strings)
+
+    def to_list(self):
+        return list(self)
+
+    def copy(self):
+        """Create a copy of the ring."""
+        new_ring = SeatRing.__new__(SeatRing)
+        new_ring.size = self.size
+        new_ring.data = self.data.copy()
+        new_ring.mask = self.mask
+        new_ring.next = self.next.copy()
+        new_ring.prev = self.prev.copy()
+        new_ring.len = self.len
+        return new_ring
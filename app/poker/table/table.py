@@ -1,34 +1,42 @@
 from typing import List, Dict, Optional, Tuple
-from app.utils.poker_utils import find_winners
+from app.utils.poker_utils import get_hand_name
+from app.utils.hand_evaluator import cards_to_array, evaluate_hands
 from datetime import datetime
 from decimal import Decimal
 from app.poker import  Deck, Card, Player, Action, Pot, Hand, Session, Round
 from app.poker.round import  possible_streets
-from .circularlinkedlist import CircularLinkedList
+from .seatring import SeatRing
 import numpy as np
 import random
 
 class Table:
-    def __init__(self, table_id: int, table_name: str, small_blind: Decimal, big_blind: Decimal, table_size: int, verbose: bool = False):
+    def __init__(self, table_id: int, table_name: str, small_blind: Decimal, big_blind: Decimal, table_size: int, verbose: bool = False,
+                 minor_units: Optional[int] = None):
         self.table_id: int = table_id
         self.table_name: str = table_name
         self.table_size = table_size
-        self.small_blind: Decimal = small_blind
-        self.big_blind: Decimal = big_blind
+        # With minor_units, chips are integers counting 1/minor_units of the currency (100 for cents) and all the chips
+        # arithmetic is integer arithmetic. Blinds are given in currency, the other amounts (stacks, actions) in chips.
+        # Currency amounts are only computed for the display and the OHH export. Without it chips are Decimal currency amounts.
+        self.minor_units = minor_units
+        self.zero = 0 if minor_units else Decimal('0.00')
+        self.small_blind: Decimal = self.to_chips(small_blind)
+        self.big_blind: Decimal = self.to_chips(big_blind)
         self.players: Dict[int, Player] = {}
         self.available_seats: List[int] = list(range(table_size)) # This list should always be ordered
-        self.active_players = CircularLinkedList()
+        self.active_players = SeatRing(table_size)
         self.playing_players = None 
+        self.hand_players: List[Player] = [] # Players dealt in the current hand, folded or not
         self.board_cards: List[Card] = []
-        self.pot: Decimal = Decimal('0.00')
-        self.uncalled_amount: Decimal = Decimal('0.00')
-        self.current_bet: Decimal = Decimal('0.00')
+        self.pot: Decimal = self.zero
+        self.uncalled_amount: Decimal = self.zero
+        self.current_bet: Decimal = self.zero
         self.current_turn: int = None
         self.current_round: Round = None
         self.current_hand: Hand = None
         self.logs: List[str] = []
         self.streets = ["Preflop", "Flop", "Turn", "River", "Showdown"]
-        self.deck: Deck = None
+        self.deck: Deck = Deck()
         self.verbose = True
         self.dealer_seat =  None
         self.dealer = None
@@ -36,6 +44,19 @@ class Table:
         self.agressor: int = None #Id of the agressor
 
 
+    def to_chips(self, amount):
+        """Converts a currency amount to table chips."""
+        if self.minor_units:
+            return int(Decimal(str(amount)) * self.minor_units)
+        return amount
+
+    def from_chips(self, amount) -> Decimal:
+        """Converts table chips to a currency amount."""
+        if self.minor_units:
+            return Decimal(amount) / self.minor_units
+        return amount
+
+
     def new_player(self, id: int, name: str, starting_stack: Decimal = Decimal(100)) -> Player:
         try:
             seat = self.available_seats.pop(0)
@@ -45,7 +66,8 @@ class Table:
                         name = name,
                         starting_stack = starting_stack,
                         #starting_stack = Decimal(f"{round(random.random(),1)*2}"),
-                        seat = seat)
+                        seat = seat,
+                        zero = self.zero)
         self.add_player(player)
         return player
 
@@ -80,8 +102,8 @@ class Table:
     
     def get_next_seat(self, seat, return_player = False) : 
         if return_player :
-            return self.active_players.get_next(player)
-        return self.active_players.get_next(player).seat
+            return self.active_players.get_next(seat)
+        return self.active_players.get_next(seat).seat
 
 
     def set_next_turn(self) -> None:
@@ -141,9 +163,9 @@ class Table:
         self.logs = []
         # Reset the game state for all players (Not only the active ones)
         # Add active players to the players list
-        self.active_players = CircularLinkedList()
+        self.active_players = SeatRing(self.table_size)
         for player in self.players.values():
-            player.reset()
+            player.reset(self.zero)
             if player.status == 'Active':
                 self.active_players.append(position = player.seat, data = player)
 
@@ -155,13 +177,14 @@ class Table:
         if len(self.active_players) < 2:
             raise Exception("Not enough players to start a game")
 
-        self.deck = Deck()  # Reset and shuffle the deck
+        self.deck.shuffle()  # Put back all the cards in the deck
         self.board_cards = []
-        self.pot = Decimal('0.00')
-        self.current_bet = Decimal('0.00')
+        self.pot = self.zero
+        self.current_bet = self.zero
         self.streets = ["Preflop", "Flop", "Turn", "River", "Showdown"]
         self.current_round = Round(round_id = 0, street = self.streets.pop(0))
         self.playing_players = self.active_players.copy()
+        self.hand_players = self.active_players.to_list()
 
         #Reset the starting_stack of the players to their current stack
         for player in self.active_players:
@@ -201,16 +224,17 @@ class Table:
             table_size=len(self.players),
             dealer_seat=self.dealer_seat,
             small_blind_amount=self.small_blind,
-            big_blind_amount=self.big_blind)
+            big_blind_amount=self.big_blind,
+            minor_units=self.minor_units)
 
 
     def give_back_uncalled_amount(self) -> None:
-        if self.uncalled_amount != Decimal('0.00') : 
+        if self.uncalled_amount != self.zero : 
             agressor = self.players[self.agressor]
             agressor.stack += self.uncalled_amount
             self.pot -= self.uncalled_amount
             self.logs.append(f"The uncalled amount of {self.uncalled_amount/self.big_blind} BB went back to {agressor.name}")
-            self.uncalled_amount = Decimal('0.00')
+            self.uncalled_amount = self.zero
 
 
     def next_round(self) -> None:
@@ -218,9 +242,9 @@ class Table:
         self.current_hand.add_round(self.current_round)
 
         # Reset bets 
-        self.current_bet = Decimal('0.00')
+        self.current_bet = self.zero
         for player in self.active_players:
-            player.bet_amount = Decimal('0.00')
+            player.bet_amount = self.zero
 
         # Create new round
         street = self.streets.pop(0) 
@@ -262,6 +286,8 @@ class Table:
 
     def action(self, action_type:str, amount: Optional[Decimal] = Decimal('0.00')) -> None:
         player = self.get_current_player()
+        if self.minor_units:
+            amount = int(amount)
 
         all_in = False
 
@@ -296,11 +322,11 @@ class Table:
                 self.active_players.remove(player.seat)
                 self.playing_players.remove(player.seat)
             case "Check" : #The player checks.
-                if self.current_bet != Decimal('0.00'):
+                if self.current_bet != self.zero:
                     if player.id != self.bb_player.id or self.current_bet != self.big_blind:
                         raise Exception("The player can't check because the current bet is not zero")
             case "Bet" : #The player bets in an un-bet/unraised pot.
-                if self.current_bet != Decimal('0.00'):
+                if self.current_bet != self.zero:
                     raise Exception("The player can't bet because the current bet is not zero")
                 all_in, amount = self.check_if_all_in(amount)
                 self.set_bet(amount)
@@ -308,7 +334,7 @@ class Table:
                 self.agressor = player.id
                 self.uncalled_amount = amount
             case "Raise" : #The player makes a raise.
-                if self.current_bet == Decimal('0.00'):
+                if self.current_bet == self.zero:
                     raise Exception("The player can't raise because the current bet is zero")
                 total_raise = player.bet_amount + amount
                 all_in, total_raise = self.check_if_all_in(total_raise)
@@ -320,7 +346,7 @@ class Table:
                 self.current_bet = total_raise
                 self.agressor = player.id
             case "Call" : #The player calls a bet/raise.
-                if self.current_bet == Decimal('0.00'):
+                if self.current_bet == self.zero:
                     raise Exception("The player can't call because the current bet is zero")
                 if self.current_bet == player.bet_amount: # Can happen when the player is BB and everyone fold or call preflop
                     raise Exception("Calling here is useless because the player bet is equal the the maximum bet")
@@ -331,7 +357,7 @@ class Table:
                     if total_bet >= self.current_bet - self.uncalled_amount:
                         self.uncalled_amount = self.current_bet - total_bet
                 else :
-                    self.uncalled_amount = Decimal("0.00")
+                    self.uncalled_amount = self.zero
 
         if all_in :
             new_action.is_all_in = True
@@ -392,69 +418,77 @@ class Table:
         return
 
     def set_winnings(self) -> None:
-        # Calculate total bets for each player (starting_stack - current_stack)
-        total_bets = {
-            player: player.starting_stack - player.stack 
-            for player in self.active_players
-        }
-        # Sort by bet amount in ascending order
-        sorted_bets = dict(sorted(total_bets.items(), key=lambda x: x[1]))
+        # Calculate total bets for each player dealt in the hand (starting_stack - current_stack), folded players included
+        contributions = sorted(((player.starting_stack - player.stack, player) for player in self.hand_players), key=lambda x: x[0])
 
         if self.verbose:
             print("\nTotal bets:")
-            for player, amount in sorted_bets.items():
+            for amount, player in contributions:
                 print(f"{player.name}: {amount}")
 
-        # Create pots based on bet levels
-        current_pot_number = 1
-        previous_bet_level = Decimal('0.00')
-        
-        for player, bet_amount in sorted_bets.items():
+        # Hands of the players still in the hand are evaluated once, for all the pots
+        ranks = {player: None for player in self.active_players}
+        if len(ranks) > 1:
+            hand_ranks = evaluate_hands(cards_to_array([player.cards + self.board_cards for player in ranks]))
+            ranks = dict(zip(ranks, hand_ranks.tolist()))
+        # Players that can win the pots, by increasing bet. The players eligible to a pot are the ones from first_eligible
+        eligible_players = [player for amount, player in contributions if player in ranks]
+        first_eligible = 0
+
+        # Create pots based on bet levels, in a single pass over the sorted bets. Money of the folded players goes to the
+        # pot of its level, levels with the same eligible players make a single pot.
+        pots = [] # [amount, index of the first eligible player]
+        previous_bet_level = self.zero
+        for index, (bet_amount, player) in enumerate(contributions):
             if bet_amount > previous_bet_level:
-                # Create new pot for this bet level
-                pot_amount = Decimal('0.00')
-                eligible_players = []
-                
-                # Calculate pot size and eligible players
-                for p, total_bet in sorted_bets.items():
-                    if total_bet >= bet_amount:
-                        pot_amount += bet_amount - previous_bet_level
-                        eligible_players.append(p)
-                
-                if pot_amount > Decimal('0.00'):
-                    pot = Pot(
-                        pot_number=current_pot_number,
-                        amount=pot_amount
-                    )
-                    
-                    if len(eligible_players) == 1:
-                        # Only one eligible player, they win this pot
-                        winner = eligible_players[0]
-                        winner.mucks = False
-                        winner.stack += pot_amount
-                        winner.add_winnings(win_amount=pot_amount)
-                        pot.add_player(winner)
-                        self.logs.append(f"{winner.name} won {pot_amount/self.big_blind} BB")
-                    else:
-                        # Find winners among eligible players
-                        eligible_hands = {
-                            p: p.cards for p in eligible_players
-                        }
-                        winners_hands = find_winners(eligible_hands, self.board_cards)
-                        portion = pot_amount / len(winners_hands)
-                        
-                        for winner, hand_name in winners_hands:
-                            winner.mucks = False
-                            winner.stack += portion
-                            winner.add_winnings(win_amount=portion)
-                            pot.add_player(winner)
-                            self.logs.append(f"{winner.name} won {portion/self.big_blind} BB with {hand_name}")
-                    
-                    self.current_hand.add_pot(pot)
-                    current_pot_number += 1
-                
+                pot_amount = (bet_amount - previous_bet_level) * (len(contributions) - index)
+                while first_eligible < len(eligible_players) and eligible_players[first_eligible].starting_stack - eligible_players[first_eligible].stack < bet_amount:
+                    first_eligible += 1
+                if first_eligible == len(eligible_players): # Nobody still in the hand bet that much
+                    first_eligible = pots[-1][1] if pots else 0
+                if pots and pots[-1][1] == first_eligible:
+                    pots[-1][0] += pot_amount
+                else:
+                    pots.append([pot_amount, first_eligible])
                 previous_bet_level = bet_amount
 
+        for current_pot_number, (pot_amount, first_eligible) in enumerate(pots, start = 1):
+            pot = Pot(
+                pot_number=current_pot_number,
+                amount=pot_amount
+            )
+            eligible = eligible_players[first_eligible:]
+
+            if len(eligible) == 1:
+                # Only one eligible player, they win this pot
+                winner = eligible[0]
+                winner.mucks = False
+                winner.stack += pot_amount
+                winner.add_winnings(win_amount=pot_amount)
+                pot.add_player(winner)
+                self.logs.append(f"{winner.name} won {pot_amount/self.big_blind} BB")
+            else:
+                # Find winners among eligible players
+                best_rank = min(ranks[player] for player in eligible)
+                winners = [player for player in eligible if ranks[player] == best_rank]
+                hand_name = get_hand_name(best_rank)
+                if self.minor_units:
+                    # Odd chips go to the first winners after the dealer
+                    portion, odd_chips = divmod(pot_amount, len(winners))
+                    winners.sort(key=lambda winner: (winner.seat - self.dealer_seat - 1) % self.table_size)
+                else:
+                    portion, odd_chips = pot_amount / len(winners), 0
+
+                for index, winner in enumerate(winners):
+                    portion_amount = portion + 1 if index < odd_chips else portion
+                    winner.mucks = False
+                    winner.stack += portion_amount
+                    winner.add_winnings(win_amount=portion_amount)
+                    pot.add_player(winner)
+                    self.logs.append(f"{winner.name} won {portion_amount/self.big_blind} BB with {hand_name}")
+
+            self.current_hand.add_pot(pot)
+
     def end_game(self) -> None:
         # Give back the uncalled amount
         self.give_back_uncalled_amount()
@@ -463,15 +497,15 @@ class Table:
         self.set_winnings()
 
         # Reset bets
-        self.current_bet = Decimal('0.00')
+        self.current_bet = self.zero
         for player in self.active_players:
-            player.bet_amount = Decimal('0.00')
+            player.bet_amount = self.zero
         self.current_turn = None
         self.current_round = None
 
         # Reset the current_hand and active_players
         self.current_hand = None
-        self.active_players = CircularLinkedList()
+        self.active_players = SeatRing(self.table_size)
         self.playing_players = None 
 
         # Set to uncactive the players for which their stack is 0: 
@@ -480,32 +514,32 @@ class Table:
                 player.status = "Unactive"
 
 
-    def get_display_data(self, player_id:int):
-        this_player = self.players[player_id]
-
+    def get_public_display_data(self):
+        """Returns the display data shared by all the players : the general data and the gamestate, without the parts
+        that depend on the player looking at the table. Computed once per update and completed for each player by
+        get_player_display_data."""
         general_data = {
             "id" : self.table_id,
             "table_name": self.table_name,
-            "small_blind_amount": self.small_blind,
-            "big_blind_amount": self.big_blind 
+            "small_blind_amount": self.from_chips(self.small_blind),
+            "big_blind_amount": self.from_chips(self.big_blind)
         }
 
         current_player = self.get_current_player()
         gamestate = {
             "pot" : self.pot / self.big_blind,
-            "board_cards": self.board_cards,
+            "board_cards": [str(card) for card in self.board_cards],
             "street": self.get_current_street(),
             "final_pots": None,
             "dealer_seat": self.dealer_seat,
-            "player_turn": current_player.id == player_id if current_player else None,
+            "current_turn_id": current_player.id if current_player else None,
             "current_turn_name": current_player.name if current_player else None,
-            "can_bet": self.current_bet == Decimal('0.00'),
-            "can_check": self.current_bet == Decimal('0.00') or self.agressor == current_player.id,
+            "can_bet": self.current_bet == self.zero,
+            "can_check": self.current_bet == self.zero or self.agressor == current_player.id,
             "logs": self.logs,
+            "used_seats": self.get_used_seats(),
         }
 
-        used_seats = self.get_used_seats()
-
         players = []
         for player in self.players.values():
             player_info = {
@@ -514,16 +548,12 @@ class Table:
                 "status": player.status,
                 "seat": player.seat,
                 "chips": player.stack / self.big_blind,
-                "bet": player.bet_amount / self.big_blind
+                "bet": player.bet_amount / self.big_blind,
+                "dealer": player.seat == self.dealer_seat
             }
-            player_info["dealer"] = player.seat == gamestate["dealer_seat"]
-            # To position of the player shouldn't be player["seat"] but the index of player in the list of used seats minus this player seat
-            seat_index = used_seats.index(player.seat)
-            this_player_seat_index = used_seats.index(this_player.seat)
-            player_info["angle"] = np.pi * (2*(seat_index - this_player_seat_index)/len(self.players) + 1/2) # Angle in radians for the position of the player on the table
-            # Add cards
+            # Cards as seen by the other players
             if player.cards:
-                if player_id == player.id or player.mucks == False:
+                if player.mucks == False:
                     player_info["cards"] = [str(card) for card in player.cards]
                 else : 
                     player_info["cards"] = ['back', 'back']
@@ -536,3 +566,28 @@ class Table:
 
         return general_data, gamestate
 
+    def get_player_display_data(self, gamestate: dict, player_id: int) -> dict:
+        """Returns the gamestate seen by the player : its turn, the positions of the players around it and its own cards."""
+        this_player = self.players[player_id]
+        used_seats = gamestate["used_seats"]
+        this_player_seat_index = used_seats.index(this_player.seat)
+
+        players = []
+        for player_info in gamestate["players"]:
+            player_info = dict(player_info)
+            # To position of the player shouldn't be player["seat"] but the index of player in the list of used seats minus this player seat
+            seat_index = used_seats.index(player_info["seat"])
+            player_info["angle"] = np.pi * (2*(seat_index - this_player_seat_index)/len(used_seats) + 1/2) # Angle in radians for the position of the player on the table
+            if player_info["id"] == player_id and this_player.cards:
+                player_info["cards"] = [str(card) for card in this_player.cards]
+            players.append(player_info)
+
+        player_gamestate = dict(gamestate)
+        player_gamestate["player_turn"] = gamestate["current_turn_id"] == player_id if gamestate["current_turn_id"] is not None else None
+        player_gamestate["players"] = players
+        return player_gamestate
+
+    def get_display_data(self, player_id:int):
+        general_data, gamestate = self.get_public_display_data()
+        return general_data, self.get_player_display_data(gamestate, player_id)
+
@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify, session, render_template, current_app, redirect
 from app.utils.models import get_db_connection, load_hands_from_db
 from app.utils.hand_parser import get_data_for_replayer
+from app.utils.ohh_codec import decode_ohh_data
 from werkzeug.utils import secure_filename
 from app.utils.decorators import login_required
+from app.utils.cache import LRUCache
 import time
 import json
 import os
@@ -10,24 +12,54 @@ import os
 replayer_bp = Blueprint('replayer', __name__)
 
 
+def get_search_filter(q):
+    """Returns the WHERE clause selecting the hands whose players, table name or hand class contain q, and its arguments."""
+    if not q:
+        return "", ()
+    if len(q) >= 3: # Use the trigram index
+        return "WHERE id IN (SELECT rowid FROM hands_search WHERE hands_search MATCH ?)", ('"' + q.replace('"', '""') + '"',)
+    # Trigrams can't match shorter strings, scan the index table which is much smaller than hands
+    return ("WHERE id IN (SELECT rowid FROM hands_search WHERE players GLOB ? OR table_name GLOB ? OR hero_hand_class GLOB ?)",
+            (f"*{q}*",) * 3)
+
+# Counts of the searched hands, keyed by (db_path, filter). Imports only add hands with increasing ids, so
+# a count is valid as long as the max id it was computed with is unchanged.
+hands_count_cache = LRUCache(maxsize = 256)
+
 def get_hands_count(db_path, q = None):
+    where, args = get_search_filter(q)
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
+        cursor.execute("SELECT MAX(id) AS max_id FROM hands")
+        max_id = cursor.fetchone()["max_id"]
+
+        key = (db_path, q or None)
+        cached = hands_count_cache.get(key)
+        if cached is not None and cached[0] == max_id:
+            return cached[1]
+
         query = f"""
         SELECT COUNT(id) AS count
         FROM hands
+        {where}
         """
-        if q is not None:
-            query += f"WHERE players GLOB '*{q}*' OR table_name GLOB '*{q}*' OR hero_hand_class GLOB '*{q}*'"
-        cursor.execute(query)
+        cursor.execute(query, args)
         count = cursor.fetchone()["count"]
+
+    hands_count_cache.set(key, (max_id, count))
     return count 
 
-def get_hands_list(db_path, page = 1, q = None, return_count = True):
+def get_hands_list(db_path, after = None, q = None, return_count = True):
+    # after is the (date_time, id) of the last hand of the previous page, None for the first page
     # q is the search filter
 
     limit = 50                              # Default items per page
-    offset = (page - 1) * limit             # Calculate offset
+    where, args = get_search_filter(q)
+    if after is not None:
+        # Keyset pagination : every page is a range read on the hands_date_time index, whatever its depth
+        where += " AND " if where else "WHERE "
+        where += "(date_time, id) < (?, ?)"
+        args = (*args, *after)
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
         query = f"""
@@ -39,11 +71,10 @@ def get_hands_list(db_path, page = 1, q = None, return_count = True):
         hero_profit AS profit,
         players
         FROM hands
+        {where}
+        ORDER BY date_time DESC, id DESC LIMIT ?
         """
-        if q is not None:
-            query += f"WHERE players GLOB '*{q}*' OR table_name GLOB '*{q}*' OR hero_hand_class GLOB '*{q}*'"
-        query += f"ORDER BY date_time DESC LIMIT {limit} OFFSET {offset}"
-        cursor.execute(query)
+        cursor.execute(query, (*args, limit))
         results = cursor.fetchall()
 
     if return_count:
@@ -52,13 +83,19 @@ def get_hands_list(db_path, page = 1, q = None, return_count = True):
 
     return results
 
+def get_page_cursor(hands_list, previous = None):
+    """Returns the cursor of the page following hands_list."""
+    if not hands_list:
+        return previous
+    return [hands_list[-1]["date_time"], hands_list[-1]["id"]]
+
 @replayer_bp.route('/')
 @login_required
 def replayer():
     db_path = session.get("db_path", None)
-    session["page"] = 1
     session["filter"] = None
-    hands_list, count = get_hands_list(db_path, session["page"])
+    hands_list, count = get_hands_list(db_path)
+    session["page_cursor"] = get_page_cursor(hands_list)
     return render_template('replayer_page.html', hands_list = hands_list, total_count = count)
 
 
@@ -67,68 +104,82 @@ def search():
     db_path = session.get("db_path", None)
     search_filter = request.args.get("filter")
     session["filter"] = search_filter
-    session["page"] = 1
-    hands_list, count = get_hands_list(db_path, 1, search_filter) 
+    hands_list, count = get_hands_list(db_path, q = search_filter) 
+    session["page_cursor"] = get_page_cursor(hands_list)
     return render_template("hands_table.html", hands_list=hands_list, total_count = count)
 
 
 @replayer_bp.route("/load_next_page")
 def load_next_page():
     db_path = session.get("db_path", None)
-    page = session["page"] +1
-    session["page"] = page
-    hands_list = get_hands_list(db_path, page, session.get("filter", None), return_count = False) 
+    page_cursor = session.get("page_cursor")
+    if page_cursor is None: # Empty first page
+        return ""
+    hands_list = get_hands_list(db_path, page_cursor, session.get("filter", None), return_count = False) 
+    session["page_cursor"] = get_page_cursor(hands_list, page_cursor)
     return render_template("hands_list.html", hands_list=hands_list)
 
-@replayer_bp.route('/select_hand')
-def select_hand():
-    selected_index = request.args.get('selected_hand')
+# Replays (general_data, game_states) keyed by (db_path, hand id). The session only stores the hand id and the
+# current state, so each step request is small whatever the size of the hand.
+replay_cache = LRUCache(maxsize = 256)
+
+def get_replay(db_path, hand_id):
+    """Returns the (general_data, game_states) of the hand, from the replay cache or parsed from the database. Returns None if the hand doesn't exist."""
+    key = (db_path, hand_id)
+    replay = replay_cache.get(key)
+    if replay is not None:
+        return replay
 
     # Retrieve the full ohh_data from the database for the selected hand
-    with get_db_connection(session["db_path"]) as conn:
+    with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT ohh_data FROM hands WHERE id=?", (selected_index,))
+        cursor.execute("SELECT ohh_data FROM hands WHERE id=?", (hand_id,))
         result = cursor.fetchone()
-        if not result:
-            return jsonify({"error": "Invalid hand selection"}), 400
-        
-        # Load ohh_data and parse it
-        ohh_data = json.loads(result["ohh_data"])
-        general_data, game_states = get_data_for_replayer(ohh_data)
+    if not result:
+        return None
+
+    # Load ohh_data and parse it
+    ohh_data = decode_ohh_data(result["ohh_data"])
+    replay = get_data_for_replayer(ohh_data)
+    replay_cache.set(key, replay)
+    return replay
+
+def render_replay_state(move, replay = None):
+    """Moves the current state of the selected hand with move(current_state, number_of_states) and renders it.
+    replay is the replay of the selected hand when the caller already has it."""
+    if replay is None:
+        replay = get_replay(session["db_path"], session.get("hand_id"))
+    if replay is None:
+        return jsonify({"error": "Invalid hand selection"}), 400
+    general_data, game_states = replay
+    session["current_state"] = max(0, min(move(session.get("current_state", 0), len(game_states)), len(game_states) - 1))
+    return render_template("hand_replayer.html",
+                           general_data=general_data,
+                           gamestate=game_states[session["current_state"]])
 
-    session["general_data"] = general_data
-    session["game_states"] = game_states
-    session["current_state"] = 0 # Change here the default loaded state
+@replayer_bp.route('/select_hand')
+def select_hand():
+    selected_index = request.args.get('selected_hand', type=int)
+    replay = get_replay(session["db_path"], selected_index)
+    if replay is None:
+        return jsonify({"error": "Invalid hand selection"}), 400
 
-    return render_template("hand_replayer.html", general_data=general_data, gamestate=game_states[session["current_state"]]) 
+    session["hand_id"] = selected_index
+    return render_replay_state(lambda current, count: 0, replay) # Change here the default loaded state
 
 @replayer_bp.route("/beginning")
 def beginning():
-    session["current_state"] = 0
-    return render_template("hand_replayer.html",
-                           general_data=session["general_data"],
-                           gamestate=session["game_states"][0])
+    return render_replay_state(lambda current, count: 0)
 
 @replayer_bp.route("/previous")
 def previous():
-    if session["current_state"] > 0 :
-        session["current_state"] -= 1
-    return render_template("hand_replayer.html",
-                           general_data=session["general_data"],
-                           gamestate=session["game_states"][session["current_state"]])
+    return render_replay_state(lambda current, count: current - 1)
 
 
 @replayer_bp.route("/next")
 def next():
-    if session["current_state"] < len(session["game_states"]) -1 :
-        session["current_state"] += 1
-    return render_template("hand_replayer.html",
-                           general_data=session["general_data"],
-                           gamestate=session["game_states"][session["current_state"]])
+    return render_replay_state(lambda current, count: current + 1)
 
 @replayer_bp.route("/end")
 def end():
-    session["current_state"] = len(session["general_data"]) -1
-    return render_template("hand_replayer.html",
-                           general_data=session["general_data"],
-                           gamestate=session["game_states"][-1])
+    return render_replay_state(lambda current, count: count - 1)
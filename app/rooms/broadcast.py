@@ -0,0 +1,61 @@
+"""Table updates sent over the table WebSockets.
+
+The gamestate shared by all the players is computed once per update, then completed for each player. Every connection
+remembers the fragments of the table it was last sent, and only the fragments that changed are rendered and
+sent. The htmx WebSocket extension swaps every top level element of a message into the element of the page with the
+same id (out of band swap), so a message is just the changed fragments one after the other. The fragments are queued
+on the connection of each player, see rooms.connections.
+"""
+from flask import render_template
+
+
+def get_fragments(general_data: dict, gamestate: dict) -> dict:
+    """Returns the fragments of the table seen by a player : {element id : (template, context)}.
+    The context holds only what the template uses, so comparing contexts tells if the fragment changed."""
+    fragments = {
+        f"seat-{player['seat']}": ("_table_seat.html", {"player": player})
+        for player in gamestate["players"]
+    }
+    fragments["community-cards"] = ("_table_board.html", {"gamestate": {"board_cards": gamestate["board_cards"]}})
+    fragments["pot"] = ("_table_pot.html", {"gamestate": {"pot": gamestate["pot"]}})
+    fragments["action-buttons"] = ("_table_actions.html", {
+        "general_data": {"id": general_data["id"]},
+        "gamestate": {key: gamestate[key] for key in ("player_turn", "can_check", "can_bet", "current_turn_name")}
+    })
+    return fragments
+
+
+def render_fragment(template: str, context: dict, rendered: dict) -> str:
+    """Renders the fragment, once per update for all the players seeing the same fragment."""
+    key = (template, repr(context))
+    html = rendered.get(key)
+    if html is None:
+        html = rendered[key] = render_template(template, **context)
+    return html
+
+
+def get_table_update(table, general_data: dict, gamestate: dict, player_id: int, connection, rendered: dict):
+    """Returns the update of the table of the player from what its connection was last sent : (replace, parts), with
+    parts [(element id, html, append)] as queued by Connection.push. The first update of a connection, or when a
+    player joined or left, replaces the whole table."""
+    player_gamestate = table.get_player_display_data(gamestate, player_id)
+    layout = (tuple(gamestate["used_seats"]), tuple(general_data.values()))
+    fragments = get_fragments(general_data, player_gamestate)
+    logs = tuple(gamestate["logs"])
+    sent = connection.sent_fragments
+    connection.sent_fragments = {"layout": layout, "fragments": fragments, "logs": logs}
+
+    if sent is None or sent["layout"] != layout:
+        html = render_fragment("poker_table_obb.html", {"general_data": general_data, "gamestate": player_gamestate}, rendered)
+        return True, [("poker-table", html, False)]
+
+    parts = [(element_id, render_fragment(template, context, rendered), False)
+             for element_id, (template, context) in fragments.items()
+             if sent["fragments"].get(element_id) != (template, context)]
+    # The logs of a hand only grow : send the new lines, or all of them for a new hand
+    if logs != sent["logs"]:
+        if logs[:len(sent["logs"])] == sent["logs"]:
+            parts.append(("logs", render_fragment("_table_logs.html", {"logs": logs[len(sent["logs"]):], "append": True}, rendered), True))
+        else:
+            parts.append(("logs", render_fragment("_table_logs.html", {"logs": logs}, rendered), False))
+    return False, parts
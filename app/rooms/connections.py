@@ -0,0 +1,91 @@
+"""Outbound queues of the WebSockets.
+
+Broadcasts only put messages in the queue of each connection and return : a sender thread per connection does the
+blocking sends, so the request of the acting player never waits for a slow or dead client. Messages are made of parts
+with a key, the id of the element they swap, and a queued part is replaced by a newer part with the same key, so a
+client that falls behind receives the latest state in one message instead of every intermediate update.
+"""
+import socket
+import threading
+import time
+
+SEND_TIMEOUT = 10 # Seconds a send can block before the client is considered dead
+MAX_PENDING_BYTES = 1 << 20 # Queued bytes before a client is considered too slow and disconnected
+
+
+class Connection:
+    def __init__(self, ws, name: str = ""):
+        self.ws = ws
+        self.name = name
+        self.pending = {} # Parts to send, by key, in the order they were queued
+        self.pending_bytes = 0
+        self.sending_since = None # Start of the send in progress, to detect the clients that don't read anymore
+        self.closed = False
+        self.sent_fragments = None # What the client was sent, used by the broadcasts to send only the changes
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name=f"Connection {name}", daemon=True)
+        self.thread.start()
+
+    def push(self, parts, replace: bool = False) -> bool:
+        """Queues the parts, [(key, html, append)]. A part replaces the queued part with the same key, or is added to
+        it if append is True. With replace, the parts replace everything queued. Returns False if the connection is closed."""
+        with self.condition:
+            if self.closed:
+                return False
+            if self.sending_since is not None and time.monotonic() - self.sending_since > SEND_TIMEOUT:
+                print(f"{self.name} : send timeout, closing the connection")
+                self.close()
+                return False
+            if replace:
+                self.pending = {}
+            for key, html, append in parts:
+                queued = self.pending.pop(key, "") if append else ""
+                self.pending.pop(key, None)
+                self.pending[key] = queued + html
+            self.pending_bytes = sum(len(html) for html in self.pending.values())
+            if self.pending_bytes > MAX_PENDING_BYTES:
+                print(f"{self.name} : {self.pending_bytes} bytes queued, closing the connection")
+                self.close()
+                return False
+            self.condition.notify()
+        return True
+
+    def send(self, key: str, html: str) -> bool:
+        return self.push([(key, html, False)])
+
+    def run(self):
+        """Sends the queued parts, all of them in one message, until the connection is closed."""
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                message = "\n".join(self.pending.values())
+                self.pending = {}
+                self.pending_bytes = 0
+                self.sending_since = time.monotonic()
+            try:
+                self.ws.send(message)
+            except Exception as e:
+                print(f"{self.name} : {e}, closing the connection")
+                with self.condition:
+                    self.close()
+                return
+            with self.condition:
+                self.sending_since = None
+
+    def close(self):
+        """Stops the sender thread and drops the queued parts. The WebSocket route returns when its socket is closed,
+        so shutting the socket down also unblocks a send in progress and the receive loop of the route."""
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.pending = {}
+            self.pending_bytes = 0
+            self.condition.notify()
+        try:
+            self.ws.sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
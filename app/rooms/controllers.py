@@ -1,7 +1,9 @@
-from flask import  request, render_template, session, flash
+from flask import  request, render_template, session, flash, current_app
 from decimal import Decimal
 from app.ws import sock
 from .models import create_room, get_all_rooms, get_room, delete_room_by_id
+from .broadcast import get_table_update
+from .connections import Connection
 from app.utils.decorators import login_required, htmx_required
 from app.utils.wrappers import render_template_flash, render_flash
 from app.utils.scripts import open_window_script
@@ -13,7 +15,7 @@ import json
 from . import rooms_bp
 
 # Track all active WebSocket connections to broadcast updates
-connected_sockets = set()
+connected_sockets = set() # Connection of each rooms WebSocket
 tables_dict = {}
 
 # Fixed global variab
@@ -73,7 +75,8 @@ def poker_room(room_id):
                       table_name=room_db["name"],
                       small_blind=Decimal(str(room_db["small_blind"])),
                       big_blind=Decimal(str(room_db["big_blind"])),
-                      table_size=room_db["max_players"])
+                      table_size=room_db["max_players"],
+                      minor_units=current_app.config.get("TABLE_MINOR_UNITS"))
         tables_dict[room_id] = table
 
     # Check if player in already in the room dictionnary
@@ -179,7 +182,8 @@ def rooms_ws(ws):
     We don't necessarily need to receive data from the client,
     but we keep this loop open so the connection remains alive.
     """
-    connected_sockets.add(ws)
+    connection = Connection(ws, "Rooms WebSocket")
+    connected_sockets.add(connection)
     print("Rooms WebSocket connected", ws) 
     try:
         while True:
@@ -189,7 +193,8 @@ def rooms_ws(ws):
                 break
     finally:
         print("Rooms WebSocket disconnected", ws) 
-        connected_sockets.discard(ws)
+        connected_sockets.discard(connection)
+        connection.close()
 
 @sock.route("/table_ws/<int:room_id>")
 def table_ws(ws, room_id):
@@ -208,7 +213,10 @@ def table_ws(ws, room_id):
         ws.close()
         return 
 
-    player.socket = ws
+    if player.socket is not None: # The player opened the table again
+        player.socket.close()
+    connection = Connection(ws, f"{session['username']} table {room_id}") # The first update replaces the whole table
+    player.socket = connection
     player.status = "Active"
 
     try:
@@ -221,11 +229,14 @@ def table_ws(ws, room_id):
         print(f" {e}")
     finally:
         print(session["username"],": Table WebSocket disconnected", ws) 
-        player.status = "disconnected"
+        connection.close()
+        if player.socket is connection:
+            player.socket = None
+            player.status = "disconnected"
 
 def broadcast_room_update():
     """
-    Gets the updated rooms list and sends it to every connected WebSocket client.
+    Gets the updated rooms list and queues it on every connected WebSocket client.
     We'll leverage HTMX's WebSocket extension so no custom JS is needed.
     """
     print("Rooms updated. Broadcasting to all clients.")
@@ -233,23 +244,23 @@ def broadcast_room_update():
     # Render a fresh snippet of the rooms list
     html = render_template("_rooms.html", rooms=rooms)
 
-    for sock_conn in list(connected_sockets):
-        try:
-            sock_conn.send(html)
-        except:
-            connected_sockets.discard(sock_conn)
+    for connection in list(connected_sockets):
+        if not connection.send("rooms_list", html):
+            connected_sockets.discard(connection)
 
 def broadcast_table_update(room_id):
+    """
+    Queues on the connection of every player of the table the fragments of the table that changed since its last update.
+    The shared gamestate is computed once, and fragments seen the same way by several players are rendered once.
+    """
     table = tables_dict[room_id]
+    general_data, gamestate = table.get_public_display_data()
+    rendered = {}
     for pp_id, pp in table.players.items():
-        if pp.socket is not None:
-            general_data, gamestate = table.get_display_data(pp_id)
-            html = render_template("poker_table_obb.html", general_data=general_data, gamestate = gamestate)
-            try :
-                pp.socket.send(html)
-            except:
-                print("The connection should have been deleted from the dict")
-                tables_dict[room_id].players[session["user_id"]].socket = None
-
-
-
+        connection = pp.socket
+        if connection is not None:
+            # Diffs are queued in the order they are computed, even when several requests update the table
+            with connection.condition:
+                replace, parts = get_table_update(table, general_data, gamestate, pp_id, connection, rendered)
+                if parts and not connection.push(parts, replace):
+                    pp.socket = None
@@ -1,21 +1,86 @@
 from flask import Blueprint, request, jsonify, session, render_template, current_app, redirect, send_file
 from app.utils.models import *
-from app.utils.plots import *
+from app.utils.charts import get_profit_series, get_range_grids
 from collections import defaultdict
 from app.utils.decorators import login_required
+from app.utils.cache import LRUCache
+from io import BytesIO
 
 import json
+import os
+import queue
+import threading
 
 statistics_bp = Blueprint('statistics', __name__)
 
+# Functions of app.utils.plots rendering the PNGs. The module is imported by the first PNG rendered, so the workers
+# that only serve the chart data never import matplotlib and seaborn.
+PLOTS = {
+    "profit": "generate_cummulative_profit_plot",
+    "opening_range": "generate_opening_range_plot",
+}
+
+# PNGs of the plots, keyed by (db_path, player, plot, parameters). A plot is valid as long as the statistics version of
+# its player is unchanged : imports update the hands count of the players of the imported hands, and rebuilds of
+# players_hands (full_update_players_hands, update_players_statistics) bump the statistics generation.
+plots_cache = LRUCache(maxsize = 128)
+
+def get_plot(db_path, player_name, plot, **params):
+    """Returns the PNG of the plot, rendered only if the statistics of the player changed since it was cached."""
+    version = get_statistics_version(db_path, player_name)
+
+    key = (db_path, player_name, plot, tuple(sorted(params.items())))
+    cached = plots_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    from app.utils import plots
+    png = getattr(plots, PLOTS[plot])(player_name, db_path, **params).getvalue()
+    plots_cache.set(key, (version, png))
+    return png
+
+# Opt-in warm-up of the plots cache (PRERENDER_PLOTS), by a single thread per process. At most one warm-up waits
+# while another runs, and get_plot skips the plots whose statistics version is unchanged, so viewing the page again
+# renders nothing until hands are imported or players_hands is rebuilt.
+prerender_queue = queue.Queue(maxsize = 1)
+prerender_lock = threading.Lock()
+prerender_thread = None
+
+def prerender_plots():
+    """Renders in the cache the default plots of the players put in prerender_queue, one database at a time."""
+    while True:
+        db_path, players = prerender_queue.get()
+        try:
+            for player_name in players:
+                get_plot(db_path, player_name, "profit", window_size = 10)
+                get_plot(db_path, player_name, "opening_range")
+        except Exception as e:
+            print(f"Error while pre-rendering plots : {e}")
+
+def start_prerendering(db_path, players):
+    """Queues the pre-rendering of the plots of the PRERENDER_PLOTS most played players (players are sorted by hands).
+    Bounded by the size of the cache, so the warm-up doesn't evict its own plots. Does nothing when PRERENDER_PLOTS is 0."""
+    global prerender_thread
+    count = min(current_app.config.get("PRERENDER_PLOTS", 0), plots_cache.maxsize // len(PLOTS))
+    if count <= 0:
+        return
+    with prerender_lock:
+        if prerender_thread is None:
+            prerender_thread = threading.Thread(target = prerender_plots, name = "prerender-plots", daemon = True)
+            prerender_thread.start()
+    try:
+        prerender_queue.put_nowait((db_path, [player["name"] for player in players[:count]]))
+    except queue.Full:
+        pass # A warm-up is already waiting, it will find the plots rendered since
+
 @statistics_bp.route('/')
 @login_required
 def statistics():
     db_path = session.get("db_path", None)
 
-    # Update and retrieve overall statistics
-    update_players_statistics(session["db_path"])
+    # Retrieve overall statistics, kept up to date at import
     players = get_players_list(session["db_path"])
+    start_prerendering(db_path, players)
     
     # Get selected player from query parameters
     selected_player = request.args.get('selected_player', None)
@@ -40,6 +105,7 @@ def statistics():
                            position_stats = position_stats,
                            player_stats_short = player_stats_short,
                            position_stats_short = position_stats_short,
+                           chartjs_vendored = os.path.exists(os.path.join(current_app.static_folder, 'js', 'chart.umd.js')),
                            )
 
 @statistics_bp.route('/player_stats_plot')
@@ -50,8 +116,8 @@ def player_stats_plot():
     if not db_path or not player_name:
         return jsonify({"error": "Database path or player name missing"}), 400
 
-    img = generate_cummulative_profit_plot(player_name, db_path, window_size)
-    return send_file(img, mimetype="image/png")
+    img = get_plot(db_path, player_name, "profit", window_size = window_size)
+    return send_file(BytesIO(img), mimetype="image/png")
 
 @statistics_bp.route('/player_opening_range_plot')
 def player_opening_range_plot():
@@ -59,6 +125,28 @@ def player_opening_range_plot():
     player_name = request.args.get('name')
     if not player_name:
         return jsonify({"error": "Player name missing"}), 400
-    img = generate_opening_range_plot(player_name, db_path)
-    return send_file(img, mimetype="image/png")
+    img = get_plot(db_path, player_name, "opening_range")
+    return send_file(BytesIO(img), mimetype="image/png")
+
 
+@statistics_bp.route('/player_profit_data')
+def player_profit_data():
+    """Cumulative profit series of the player by hands or by day, downsampled to the given number of points, drawn by the browser."""
+    db_path = session.get("db_path")
+    player_name = request.args.get('name')
+    window_size = int(request.args.get('window_size', 10))
+    points = int(request.args.get('points', 1000)) # Width of the chart in pixels
+    by = request.args.get('by', 'hands') # hands or day
+    if not db_path or not player_name:
+        return jsonify({"error": "Database path or player name missing"}), 400
+    return jsonify(get_profit_series(player_name, db_path, window_size, points, by))
+
+@statistics_bp.route('/player_range_data')
+def player_range_data():
+    """13x13 range grids of the player for every position, or the given position name, drawn by the browser."""
+    db_path = session.get("db_path")
+    player_name = request.args.get('name')
+    position = request.args.get('position')
+    if not db_path or not player_name:
+        return jsonify({"error": "Database path or player name missing"}), 400
+    return jsonify(get_range_grids(player_name, db_path, position))
@@ -0,0 +1,141 @@
+"""Data of the statistics charts, rendered by the browser.
+
+Unlike plots.py, nothing here imports pandas, matplotlib or seaborn : the web workers only aggregate the data and
+send it as JSON. Long series are downsampled to the width of the chart with Largest Triangle Three Buckets.
+"""
+import numpy as np
+from app.utils.models import (get_player_profit_historique, get_player_profit_buckets, get_player_profit_days,
+                              get_range_statistics, get_db_connection, PROFIT_BUCKET_SIZE)
+
+MAX_POINTS = 4000 # Upper bound of the points of a series, whatever the client asks
+RAW_SERIES_HANDS = 50_000 # Players with more hands are drawn from the profit rollups, without reading their hands
+
+hand_structure = [
+    ['AA', 'AKs', 'AQs', 'AJs', 'ATs', 'A9s', 'A8s', 'A7s', 'A6s', 'A5s', 'A4s', 'A3s', 'A2s'],
+    ['AKo', 'KK', 'KQs', 'KJs', 'KTs', 'K9s', 'K8s', 'K7s', 'K6s', 'K5s', 'K4s', 'K3s', 'K2s'],
+    ['AQo', 'KQo', 'QQ', 'QJs', 'QTs', 'Q9s', 'Q8s', 'Q7s', 'Q6s', 'Q5s', 'Q4s', 'Q3s', 'Q2s'],
+    ['AJo', 'KJo', 'QJo', 'JJ', 'JTs', 'J9s', 'J8s', 'J7s', 'J6s', 'J5s', 'J4s', 'J3s', 'J2s'],
+    ['ATo', 'KTo', 'QTo', 'JTo', 'TT', 'T9s', 'T8s', 'T7s', 'T6s', 'T5s', 'T4s', 'T3s', 'T2s'],
+    ['A9o', 'K9o', 'Q9o', 'J9o', 'T9o', '99', '98s', '97s', '96s', '95s', '94s', '93s', '92s'],
+    ['A8o', 'K8o', 'Q8o', 'J8o', 'T8o', '98o', '88', '87s', '86s', '85s', '84s', '83s', '82s'],
+    ['A7o', 'K7o', 'Q7o', 'J7o', 'T7o', '97o', '87o', '77', '76s', '75s', '74s', '73s', '72s'],
+    ['A6o', 'K6o', 'Q6o', 'J6o', 'T6o', '96o', '86o', '76o', '66', '65s', '64s', '63s', '62s'],
+    ['A5o', 'K5o', 'Q5o', 'J5o', 'T5o', '95o', '85o', '75o', '65o', '55', '54s', '53s', '52s'],
+    ['A4o', 'K4o', 'Q4o', 'J4o', 'T4o', '94o', '84o', '74o', '64o', '54o', '44', '43s', '42s'],
+    ['A3o', 'K3o', 'Q3o', 'J3o', 'T3o', '93o', '83o', '73o', '63o', '53o', '43o', '33', '32s'],
+    ['A2o', 'K2o', 'Q2o', 'J2o', 'T2o', '92o', '82o', '72o', '62o', '52o', '42o', '32o', '22']
+]
+
+
+def lttb(x, y, threshold):
+    """Returns the indices of the threshold points of the series kept by Largest Triangle Three Buckets : the first
+    and last points, and in each bucket of the points between them the one forming the largest triangle with the point
+    kept in the previous bucket and the mean of the next bucket. Unlike keeping one point every n, the peaks and drops
+    of the curve stay visible."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int) # threshold - 2 buckets between the first and last points
+    edges = np.append(edges, n) # The last point is the "next bucket" of the last bucket
+    indices = np.empty(threshold, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, stop, next_stop = edges[i], edges[i + 1], edges[i + 2]
+        mean_x, mean_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        areas = np.abs((x[a] - mean_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (mean_y - y[a]))
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+def rolling_mean(values, window_size):
+    """Mean of the window_size last values, for each value from the window_size-th one."""
+    sums = np.cumsum(np.insert(values, 0, 0.0))
+    return (sums[window_size:] - sums[:-window_size]) / window_size
+
+
+def get_profit_series(player_name, db_path, window_size = 10, points = 1000, by = "hands"):
+    """Returns the cumulative profit of the player and its all-in EV version, with at most points points per series :
+    {"hands", "by", "window_size", "bucketed", "series": {name: {"x", "y"}}}.
+    By hands, the series are smoothed by a rolling mean of window_size hands like the profit plot. Above
+    RAW_SERIES_HANDS hands, they are read from players_profit_buckets instead, one point every PROFIT_BUCKET_SIZE hands,
+    bucketed is True and window_size is the size of the buckets, whatever was asked. By day, x holds the days and the values are the ones at the end of each day."""
+    points = max(3, min(points, MAX_POINTS))
+    window_size = max(1, window_size)
+    with get_db_connection(db_path) as conn:
+        player = conn.execute("SELECT hands FROM players WHERE name = ?", (player_name,)).fetchone()
+    hands = (player and player["hands"]) or 0
+
+    bucketed = False
+    if by == "day":
+        rows = get_player_profit_days(player_name, db_path)
+        x = np.array([row["day"] for row in rows])
+        values = {column: [row["cum_" + column] for row in rows] for column in ("profit", "ev_profit")}
+        window_size = None
+    elif hands > RAW_SERIES_HANDS:
+        rows = get_player_profit_buckets(player_name, db_path)
+        x = np.array([row["hands"] - 1 for row in rows]) # Hand number of the last hand of each bucket, from 0
+        values = {column: [row["cum_" + column] for row in rows] for column in ("profit", "ev_profit")}
+        window_size = PROFIT_BUCKET_SIZE
+        bucketed = True
+    else:
+        player_profits = get_player_profit_historique(player_name, db_path)
+        # '%Y-%m-%d %H:%M:%S' strings sort like dates, then by hand id like the profit rollups
+        player_profits.sort(key = lambda row: (row["date_time"], row["hand_id"]))
+        values = {}
+        for column in ("profit", "ev_profit"):
+            profit_cum = np.cumsum(np.array([row[column] for row in player_profits], dtype=float))
+            values[column] = rolling_mean(profit_cum, window_size) if len(profit_cum) >= window_size else np.empty(0)
+        x = np.arange(window_size - 1, window_size - 1 + len(values["profit"])) # Hand numbers, from 0 like the profit plot
+
+    series = {}
+    for name, column in (("Results", "profit"), ("All-in EV", "ev_profit")):
+        y = np.array(values[column], dtype=float)
+        kept = lttb(np.arange(len(y), dtype=float) if by == "day" else x, y, points)
+        series[name] = {"x": x[kept].tolist(), "y": np.round(y[kept], 2).tolist()}
+
+    return {"hands": hands, "by": by, "window_size": window_size, "bucketed": bucketed, "series": series}
+
+
+# Range grids : frequency name -> (numerator, denominator), with the denominators of the position statistics table
+RANGE_FREQUENCIES = {
+    "vpip": ("vpip", "hands"),
+    "pfr": ("pfr", "hands"),
+    "two_bet": ("two_bet", "two_bet_possibility"),
+    "limp": ("limp", "two_bet_possibility"),
+    "three_bet": ("three_bet", "three_bet_possibility"),
+}
+RANGE_COUNTS = ["hands", "vpip", "pfr", "limp", "two_bet_possibility", "two_bet", "three_bet_possibility", "three_bet"]
+
+
+def get_hand_class_counts(player_name, db_path):
+    """Returns the counts of the player by position name, and over all positions under "All" :
+    {position : {hand_class : {count name : count}}}, and the position names from the first to act to the button."""
+    positions = {"All": {}}
+    order = {}
+    for row in get_range_statistics(player_name, db_path):
+        order[row["position_name"]] = max(order.get(row["position_name"], row["position"]), row["position"])
+        for position in (row["position_name"], "All"):
+            counts = positions.setdefault(position, {}).setdefault(row["hand_class"], dict.fromkeys(RANGE_COUNTS, 0))
+            for name in RANGE_COUNTS:
+                counts[name] += row[name] or 0
+    return positions, sorted(order, key = lambda name: -order[name])
+
+
+def get_range_grids(player_name, db_path, position = None):
+    """Returns the range grids of the player in the 13x13 layout of hand_structure, for every position and over all of
+    them, or for the given position name only : the number of hands of each class and the frequencies of RANGE_FREQUENCIES,
+    None where the player never had the possibility."""
+    positions, order = get_hand_class_counts(player_name, db_path)
+    names = ["All"] + order if position is None else [position]
+    grids = {}
+    for name in names:
+        classes = positions.get(name, {})
+        grid = {"hands": [[classes[hand]["hands"] if hand in classes else 0 for hand in row] for row in hand_structure]}
+        for frequency, (numerator, denominator) in RANGE_FREQUENCIES.items():
+            grid[frequency] = [[classes[hand][numerator] / classes[hand][denominator]
+                                if hand in classes and classes[hand][denominator] else None
+                                for hand in row] for row in hand_structure]
+        grids[name] = grid
+    return {"hands": hand_structure, "positions": names, "grids": grids}
@@ -0,0 +1,154 @@
+"""Hand equity calculations on top of the batch evaluator.
+
+Holdings are given as hole cards ("AsKd" or ["As", "Kd"]) or as ranges of hand classes, the names used in the
+hand_structure grid of plots.py ("AKs", ["QQ", "AKs", "AKo"]). The board can have 0 to 5 cards.
+When the number of possible deals is small enough every deal is enumerated, otherwise deals are sampled (Monte Carlo).
+Work is split in tasks that can be spread over a process pool, given by the caller.
+"""
+import itertools
+import math
+import numpy as np
+from app.utils.hand_evaluator import CARD_TO_INT, RANKS, card_to_int, evaluate_hands
+
+EXACT_LIMIT = 500_000 # Maximum number of deals to enumerate, sampling is used above
+TASK_SIZE = 100_000 # Deals per task
+
+
+def hand_class_combos(hand_class):
+    """Returns the hole cards combos, as sorted integer pairs, of a hand class like "AA", "AKs", "AKo" or "AK"."""
+    rank1, rank2 = RANKS.index(hand_class[0]), RANKS.index(hand_class[1])
+    suited = hand_class[2:] == 's'
+    offsuit = hand_class[2:] == 'o'
+    combos = []
+    for suit1, suit2 in itertools.product(range(4), repeat=2):
+        if rank1 == rank2 and suit1 >= suit2:
+            continue
+        if (suited and suit1 != suit2) or (offsuit and suit1 == suit2):
+            continue
+        combos.append(tuple(sorted((4 * rank1 + suit1, 4 * rank2 + suit2))))
+    return combos
+
+
+def holding_combos(holding):
+    """Returns the list of integer combos of a holding : hole cards or hand classes."""
+    if isinstance(holding, str):
+        holding = [holding[i:i + 2] for i in range(0, len(holding), 2)] if holding[1] in "cdhs" else [holding]
+    if len(holding) == 2 and all(not isinstance(card, str) or card in CARD_TO_INT for card in holding):
+        return [tuple(sorted(card_to_int(card) for card in holding))]
+    return sorted({combo for hand_class in holding for combo in hand_class_combos(hand_class)})
+
+
+def can_be_dealt(combos, used=frozenset()):
+    """Returns whether every player can get one combo of its range without two players sharing a card."""
+    if not combos:
+        return True
+    return any(can_be_dealt(combos[1:], used | set(combo)) for combo in combos[0] if not used & set(combo))
+
+
+def score_deals(ranks):
+    """Returns the equity shares, wins and ties of each player from an (n_players, n_deals) array of hand ranks."""
+    winners = ranks == ranks.min(axis=0)
+    n_winners = winners.sum(axis=0)
+    shares = (winners / n_winners).sum(axis=1)
+    wins = (winners & (n_winners == 1)).sum(axis=1)
+    ties = (winners & (n_winners > 1)).sum(axis=1)
+    return shares, wins, ties
+
+
+def rank_deals(holes, board, fills):
+    """Ranks the hands of every player for every deal.
+    holes is (n_deals, n_players, 2), board the known board cards and fills the (n_deals, 5 - len(board)) missing cards."""
+    n_deals, n_players = holes.shape[:2]
+    board = np.broadcast_to(np.asarray(board, dtype=np.int64), (n_deals, len(board)))
+    common = np.concatenate([board, fills], axis=1)
+    hands = np.concatenate([holes.transpose(1, 0, 2), np.broadcast_to(common, (n_players, n_deals, 5))], axis=2)
+    return evaluate_hands(hands.reshape(-1, 7)).reshape(n_players, n_deals)
+
+
+def exact_task(holes, board, remaining, start, stop):
+    """Scores the boards start to stop of the enumeration of the remaining cards, for fixed hole cards."""
+    missing = 5 - len(board)
+    fills = itertools.islice(itertools.combinations(remaining, missing), start, stop)
+    fills = np.array(list(fills), dtype=np.int64).reshape(stop - start, missing)
+    holes = np.broadcast_to(np.asarray(holes, dtype=np.int64), (len(fills), len(holes), 2))
+    return score_deals(rank_deals(holes, board, fills)) + (len(fills),)
+
+
+def monte_carlo_task(combos, board, dead, samples, seed):
+    """Scores samples random deals, each player getting one combo of its range."""
+    rng = np.random.default_rng(seed)
+    missing = 5 - len(board)
+    known = np.zeros(52, dtype=bool)
+    known[list(board) + list(dead)] = True
+    combos = [np.asarray(player_combos, dtype=np.int64) for player_combos in combos]
+    shares, wins, ties, done = 0, 0, 0, 0
+    while done < samples:
+        size = samples - done
+        holes = np.stack([player_combos[rng.integers(len(player_combos), size=size)] for player_combos in combos], axis=1)
+        # Players can't share cards : deals where they do are rejected
+        cards = np.sort(holes.reshape(size, -1), axis=1)
+        holes = holes[(cards[:, 1:] != cards[:, :-1]).all(axis=1)]
+        if len(holes) == 0:
+            continue
+        # The missing board cards are the first ones of a random order of the cards not in use
+        keys = rng.random((len(holes), 52))
+        keys[:, known] = 2
+        np.put_along_axis(keys, holes.reshape(len(holes), -1), 2, axis=1)
+        fills = np.argsort(keys, axis=1)[:, :missing]
+        task_shares, task_wins, task_ties = score_deals(rank_deals(holes, board, fills))
+        shares, wins, ties, done = shares + task_shares, wins + task_wins, ties + task_ties, done + len(holes)
+    return shares, wins, ties, done
+
+
+def _run_task(task):
+    function, args = task
+    return function(*args)
+
+
+def compute_equity(holdings, board=(), dead=(), samples=200_000, exact_limit=EXACT_LIMIT, executor=None, seed=None):
+    """Computes the equity of each holding against the others.
+    Returns a dictionary with the equity, win and tie frequencies of each holding, the number of deals scored,
+    and whether they were all enumerated (exact) or sampled. When an executor is given tasks are run on it."""
+    board = [card_to_int(card) for card in board]
+    dead = [card_to_int(card) for card in dead]
+    if len(board) > 5 or len(board) in (1, 2):
+        raise ValueError("The board must have 0, 3, 4 or 5 cards")
+    known = set(board) | set(dead)
+    combos = [[combo for combo in holding_combos(holding) if not known & set(combo)] for holding in holdings]
+    if any(len(player_combos) == 0 for player_combos in combos):
+        raise ValueError("A holding has no combo left once board and dead cards are removed")
+    # Sampling rejects the deals where players share a card, it would never end if they always do
+    if not can_be_dealt(combos):
+        raise ValueError("The holdings can't be dealt together")
+
+    missing = 5 - len(board)
+    n_remaining = 52 - len(known) - 2 * len(holdings)
+    n_boards = math.comb(n_remaining, missing)
+    exact = math.prod(len(player_combos) for player_combos in combos) * n_boards <= exact_limit
+
+    tasks = []
+    if exact:
+        for holes in itertools.product(*combos):
+            used = set(itertools.chain(*holes))
+            if len(used) < 2 * len(holes):
+                continue
+            remaining = [card for card in range(52) if card not in known | used]
+            tasks += [(exact_task, (holes, board, remaining, start, min(start + TASK_SIZE, n_boards)))
+                      for start in range(0, n_boards, TASK_SIZE)]
+        if not tasks:
+            raise ValueError("The holdings can't be dealt together")
+    else:
+        n_tasks = math.ceil(samples / TASK_SIZE)
+        seeds = np.random.SeedSequence(seed).spawn(n_tasks)
+        tasks = [(monte_carlo_task, (combos, board, dead, len(task_samples), task_seed))
+                 for task_samples, task_seed in zip(np.array_split(np.arange(samples), n_tasks), seeds)]
+
+    results = executor.map(_run_task, tasks) if executor else map(_run_task, tasks)
+    shares, wins, ties, deals = (sum(values) for values in zip(*results))
+    return {
+        "equity": (shares / deals).tolist(),
+        "win": (wins / deals).tolist(),
+        "tie": (ties / deals).tolist(),
+        "deals": int(deals),
+        "exact": exact,
+    }
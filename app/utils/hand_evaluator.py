@@ -0,0 +1,95 @@
+"""Vectorized hand evaluation.
+
+Cards are integers rank*4 + suit, with ranks 2..A as 0..12 and suits in the order c, d, h, s. This is the encoding
+used by phevaluator, and the returned ranks are phevaluator's : 1 is a royal flush and 7462 the worst high card.
+
+A hand is ranked with two lookup tables built once from phevaluator :
+- flush hands are looked up by the 13 bits mask of the ranks of their flush suit,
+- other hands by the multiset of their ranks, encoded in base 5 (at most 4 cards per rank).
+With 5 to 7 cards a flush can't be beaten by the other cards, so the best of the two lookups is the hand rank.
+"""
+import itertools
+from threading import Lock
+import numpy as np
+from phevaluator import evaluate_cards
+
+RANKS = "23456789TJQKA"
+SUITS = "cdhs"
+CARD_TO_INT = {rank + suit: 4 * r + s for r, rank in enumerate(RANKS) for s, suit in enumerate(SUITS)}
+INT_TO_CARD = {value: card for card, value in CARD_TO_INT.items()}
+
+WORST_RANK = 7462
+RANK_POWERS = 5 ** np.arange(13, dtype=np.int64)
+RANK_BITS = 1 << np.arange(13, dtype=np.int64)
+
+_tables = None
+_tables_lock = Lock()
+
+
+def card_to_int(card):
+    """Returns the integer of a card given as a string ("As", "Td", ...), an app.poker Card or already as an integer."""
+    return CARD_TO_INT[card] if isinstance(card, str) else int(card)
+
+
+def cards_to_array(hands):
+    """Converts a list of hands to an integer array. Cards can be strings, Card objects or integers."""
+    return np.array([[card_to_int(card) for card in hand] for hand in hands], dtype=np.int64)
+
+
+def _build_tables():
+    # Flush table : best hand made with cards of a single suit, for every mask of 5 to 7 ranks
+    flush_table = np.full(1 << 13, WORST_RANK + 1, dtype=np.int32)
+    for size in (5, 6, 7):
+        for ranks in itertools.combinations(range(13), size):
+            mask = sum(1 << rank for rank in ranks)
+            flush_table[mask] = evaluate_cards(*(4 * rank for rank in ranks))
+
+    # Non flush table : for every multiset of 5 to 7 ranks, suits are spread so that no flush is possible
+    keys = []
+    values = []
+    for size in (5, 6, 7):
+        for ranks in itertools.combinations_with_replacement(range(13), size):
+            cards = []
+            key = 0
+            for rank, group in itertools.groupby(ranks):
+                count = len(list(group))
+                if count > 4:
+                    break
+                # Suits cycle over the cards, a suit never gets more than 2 of the 7 cards
+                cards += [4 * rank + (len(cards) + i) % 4 for i in range(count)]
+                key += count * 5 ** rank
+            else:
+                keys.append(key)
+                values.append(evaluate_cards(*cards))
+    order = np.argsort(keys)
+    return flush_table, np.array(keys, dtype=np.int64)[order], np.array(values, dtype=np.int32)[order]
+
+
+def get_tables():
+    """Returns the lookup tables, building them on first use (about a second)."""
+    global _tables
+    if _tables is None:
+        with _tables_lock:
+            if _tables is None:
+                _tables = _build_tables()
+    return _tables
+
+
+def evaluate_hands(cards):
+    """Ranks many hands in one call.
+    cards is an (n, k) integer array with 5 <= k <= 7 cards per hand. Returns the (n,) array of phevaluator ranks."""
+    cards = np.asarray(cards, dtype=np.int64)
+    flush_table, keys, values = get_tables()
+    ranks = cards >> 2
+    suits = cards & 3
+
+    # Rank multiset of each hand
+    no_flush = values[np.searchsorted(keys, RANK_POWERS[ranks].sum(axis=1))]
+
+    # Ranks mask of each suit, the flush table gives WORST_RANK + 1 for suits with less than 5 cards
+    best = no_flush
+    bits = RANK_BITS[ranks]
+    for suit in range(4):
+        masks = np.where(suits == suit, bits, 0).sum(axis=1)
+        best = np.minimum(best, flush_table[masks])
+    return best
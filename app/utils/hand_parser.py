@@ -1,10 +1,13 @@
 from collections import defaultdict
+import zlib
 import numpy as np
 from datetime import datetime
 from app.utils.poker_utils import cardsToClass, getCardSymbol, cardsListToString
+from app.utils.equity import compute_equity
 
 
-def parse_hand_at_upload(ohh_obj):
+def parse_hand_at_upload(ohh_obj, allin_ev_samples = None):
+    # allin_ev_samples is the number of samples of the equity of preflop all-ins, ALLIN_EV_SAMPLES by default
     #Extract general info necessary for hand insertion in table
     ohh_data = ohh_obj["ohh"]
     hero_id = ohh_data.get("hero_player_id")
@@ -54,6 +57,7 @@ def parse_hand_at_upload(ohh_obj):
                               "position": 0,
                               "position_name": None,
                               "profit": 0,
+                              "ev_profit": 0,
                               "rake" : 0,
                               "participed" : 0,
                               "vpip": 0,
@@ -125,6 +129,9 @@ def parse_hand_at_upload(ohh_obj):
 
     number_players = len(game_participation)
 
+    # All-in adjusted profits, the other players keep their real profit
+    ev_profits = get_allin_ev_profits(ohh_data, allin_ev_samples) or {}
+
     # Generate seats_list for players that participated
     seats_list = []
     for name in game_participation:
@@ -152,6 +159,7 @@ def parse_hand_at_upload(ohh_obj):
         players_hands_data[name]["position"] = position
         players_hands_data[name]["position_name"] = position_to_name[(position,number_players)]
         players_hands_data[name]["profit"] = player_profit[name]
+        players_hands_data[name]["ev_profit"] = ev_profits.get(name, player_profit[name])
         if name in player_cards :
             cards = player_cards[name]
             players_hands_data[name]["cards"] = cards
@@ -199,6 +207,147 @@ def parse_hand_at_upload(ohh_obj):
 
     return hands_data, players_hands_data
 
+# Settings of the equity calculations of all-in hands : boards are enumerated up to ALLIN_EV_EXACT_LIMIT deals
+# (all-ins on the flop or the turn), preflop all-ins are sampled. They run for every all-in hand of an import, so the
+# default number of samples is kept small (about 4 ms and 1% of standard error per heads-up all-in), the ALLIN_EV_SAMPLES
+# config of the import commands can raise it
+ALLIN_EV_SAMPLES = 2000
+ALLIN_EV_EXACT_LIMIT = 50000
+
+def get_allin_ev_profits(ohh_data, samples = None):
+    """Returns the all-in adjusted profit of the players still in the hand when everyone but at most one player is all-in
+    before the river : each pot is shared according to the equity of the players it is contested by, instead of the real result.
+    samples is the number of deals sampled when the boards are too many to enumerate, ALLIN_EV_SAMPLES by default.
+    Returns None if there is no such all-in, or if the cards of one of these players are unknown."""
+    id_to_name = {p['id']: p['name'] for p in ohh_data['players']}
+    stacks = {p['id']: float(p['starting_stack']) for p in ohh_data['players']}
+    contributed = defaultdict(float)
+    acted = set()
+    folded = set()
+    all_in = set()
+    cards = {}
+    board = []
+    allin_board = None
+
+    for round_data in ohh_data['rounds']:
+        if round_data['street'] == "Showdown":
+            for action in round_data['actions']:
+                if action.get("cards"):
+                    cards[action["player_id"]] = action["cards"]
+            continue
+        board = board + round_data.get("cards", [])
+        for action in round_data['actions']:
+            player_id = action.get("player_id")
+            amount = float(action.get("amount", 0))
+            contributed[player_id] += amount
+            acted.add(player_id)
+            if action["action"] == "Fold":
+                folded.add(player_id)
+            if action.get("cards"):
+                cards[player_id] = action["cards"]
+            if action.get("is_allin") or (amount > 0 and contributed[player_id] >= stacks[player_id]):
+                all_in.add(player_id)
+
+        # At the end of the street, the betting is over if at most one of the remaining players still has chips
+        in_hand = [player_id for player_id in acted if player_id not in folded]
+        if allin_board is None and len(in_hand) >= 2 and len(set(in_hand) - all_in) <= 1:
+            allin_board = board
+            allin_players = in_hand
+
+    if allin_board is None or len(allin_board) == 5 or any(player_id not in cards for player_id in allin_players):
+        return None
+
+    # Pots are built level by level from the contributions of the remaining players. A level contested by a single player
+    # is an uncalled bet given back, the rake is taken from the contested levels.
+    levels = sorted({contributed[player_id] for player_id in allin_players})
+    rake = sum(float(pot.get("rake", 0)) for pot in ohh_data['pots'])
+    pots = []
+    previous = 0
+    for level in levels:
+        # Money of the folded players above the last level goes to the last pot
+        top = float("inf") if level == levels[-1] else level
+        amount = sum(min(value, top) - min(value, previous) for value in contributed.values())
+        eligible = tuple(player_id for player_id in allin_players if contributed[player_id] >= level)
+        pots.append((amount, eligible))
+        previous = level
+    contested = sum(amount for amount, eligible in pots if len(eligible) > 1)
+    rake_rate = rake / contested if contested else 0
+
+    seed = zlib.crc32(str(ohh_data.get("game_number")).encode())
+    received = defaultdict(float)
+    for amount, eligible in pots:
+        if len(eligible) == 1:
+            received[eligible[0]] += amount
+            continue
+        equity = compute_equity([cards[player_id] for player_id in eligible], board=allin_board, samples=samples or ALLIN_EV_SAMPLES,
+                                exact_limit=ALLIN_EV_EXACT_LIMIT, seed=seed)["equity"]
+        for player_id, player_equity in zip(eligible, equity):
+            received[player_id] += player_equity * amount * (1 - rake_rate)
+
+    return {id_to_name[player_id]: '%g' % round(received[player_id] - contributed[player_id], 4) for player_id in allin_players}
+
+class ReplayFrames:
+    """Game states of a replay, stored as one base state plus the changes made by each action.
+    A full copy of the state is kept every keyframe_interval frames, so any frame is rebuilt from the closest keyframe
+    with at most keyframe_interval deltas. Supports len() and indexing like the list of game states it replaces.
+    Returned states are shared with the other requests of the cached replay and must not be modified."""
+
+    def __init__(self, base_state, keyframe_interval = 16):
+        self.keyframe_interval = keyframe_interval
+        self.state = base_state # Working state, modified through set and set_player
+        self.pending = {} # Changes since the last frame
+        self.deltas = []
+        self.keyframes = []
+        self.last_frame = None # (index, state) of the last rebuilt frame, returned again without rebuilding it
+
+    def set(self, field, value):
+        self.state[field] = value
+        self.pending[field] = value
+
+    def set_player(self, index, field, value):
+        self.state["players"][index][field] = value
+        self.pending.setdefault("players", {}).setdefault(index, {})[field] = value
+
+    def add_frame(self):
+        """Records the current state as a new frame."""
+        if len(self.deltas) % self.keyframe_interval == 0:
+            self.keyframes.append(copy_state(self.state))
+        self.deltas.append(self.pending)
+        self.pending = {}
+
+    def __len__(self):
+        return len(self.deltas)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.deltas)
+        if not 0 <= index < len(self.deltas):
+            raise IndexError("Replay frame index out of range")
+        keyframe, offset = divmod(index, self.keyframe_interval)
+        if offset == 0:
+            return self.keyframes[keyframe]
+        last_frame = self.last_frame
+        if last_frame is not None and last_frame[0] == index:
+            return last_frame[1]
+        state = copy_state(self.keyframes[keyframe])
+        for delta in self.deltas[index - offset + 1 : index + 1]:
+            apply_delta(state, delta)
+        self.last_frame = (index, state)
+        return state
+
+def copy_state(state):
+    state = state.copy()
+    state["players"] = [player.copy() for player in state["players"]]
+    return state
+
+def apply_delta(state, delta):
+    for field, value in delta.items():
+        if field == "players":
+            for index, player_delta in value.items():
+                state["players"][index].update(player_delta)
+        else:
+            state[field] = value
+
 def get_data_for_replayer(hand_data, amount_in_BB = True):
     if "ohh" not in hand_data:
         print("Error", "Invalid hand data format. Missing 'ohh' key")
@@ -246,54 +395,43 @@ def get_data_for_replayer(hand_data, amount_in_BB = True):
         action_snapshot["players"].append(player_info)
         id_to_index[player['id']] = index 
 
-    game_states = []
+    # Each action only records what it changes, instead of a copy of the whole table
+    game_states = ReplayFrames(action_snapshot)
+    state = game_states.state
     need_to_deal_cards = False
     action_amount = 0
 
-    states_to_pop = []
-
     for round_info in ohh_data["rounds"]:
 
         # If the street changes
-        if action_snapshot["street"] != round_info["street"]:
+        if state["street"] != round_info["street"]:
             # Change the name of the street
-            action_snapshot["street"] = round_info["street"]
+            game_states.set("street", round_info["street"])
             # For each player
-            for player in action_snapshot["players"]:
+            for index in range(len(state["players"])):
                 # Reset its bet to 0 
-                player["bet"] = 0
+                game_states.set_player(index, "bet", 0)
 
             # Add cards to the board
             if "cards" in round_info:
-                action_snapshot["board_cards"] += round_info["cards"] 
-                action_snapshot["action"] = "New card(s)"
+                game_states.set("board_cards", state["board_cards"] + round_info["cards"])
+                game_states.set("action", "New card(s)")
 
-            if action_snapshot["street"] != "Showdown" :
-                game_states.append(action_snapshot)
-
-            #Copy action_snapshot for next action
-            players = []
-            for player in action_snapshot["players"]:
-                players.append(player.copy())
-            board_cards = action_snapshot["board_cards"].copy()
-            action_snapshot = action_snapshot.copy()
-            action_snapshot["players"] = players
-            action_snapshot["board_cards"] = board_cards
+            if state["street"] != "Showdown" :
+                game_states.add_frame()
 
         # For each action
         for action in round_info["actions"]:
 
-            if action["action"] in ["Post BB", "Post SB", "Post Extra Blind"]:
-                states_to_pop.append(len(game_states))
-
-            player = action_snapshot["players"][id_to_index[action.get("player_id")]]
+            index = id_to_index[action.get("player_id")]
+            player = state["players"][index]
             action_amount = float(action.get('amount',0))
             if amount_in_BB : action_amount = action_amount / general_data["big_blind_amount"]
 
             # If need to dealt cards, give back cards to every player:
             if need_to_deal_cards:
-                for pl in action_snapshot["players"]:
-                    pl["cards"] = ['back', 'back']
+                for pl_index in range(len(state["players"])):
+                    game_states.set_player(pl_index, "cards", ['back', 'back'])
                 need_to_deal_cards = False
 
             # If big blind is posted, need to deal cards
@@ -301,52 +439,38 @@ def get_data_for_replayer(hand_data, amount_in_BB = True):
 
             # If cards in action, add it to the player (given to Hero or showed)
             if action.get("cards"):
-                player["cards"] = action["cards"]
+                game_states.set_player(index, "cards", action["cards"])
 
             # If player folds, remove its cards
             if action['action'] == "Fold":
-                player["cards"] = []
+                game_states.set_player(index, "cards", [])
 
             # Generate a description for the action
             if action_amount == 0:
-                action_snapshot["action"] = f"{player['name']}: {action['action']}"
+                game_states.set("action", f"{player['name']}: {action['action']}")
             else :
-                action_snapshot["action"] = f"{player['name']}: {action['action']} for {action_amount}"
+                game_states.set("action", f"{player['name']}: {action['action']} for {action_amount}")
 
             # Update bet, chip amount and pot
-            player["bet"] += action_amount
-            player["chips"] -= action_amount
-            action_snapshot["pot"] += action_amount
-
-            game_states.append(action_snapshot)
+            game_states.set_player(index, "bet", player["bet"] + action_amount)
+            game_states.set_player(index, "chips", player["chips"] - action_amount)
+            game_states.set("pot", state["pot"] + action_amount)
 
-            #Copy action_snapshot for next action
-            players = []
-            for player in action_snapshot["players"]:
-                players.append(player.copy())
-            board_cards = action_snapshot["board_cards"].copy()
-            action_snapshot = action_snapshot.copy()
-            action_snapshot["players"] = players
-            action_snapshot["board_cards"] = board_cards
+            # Blinds are not shown as separate states, their changes are part of the next state
+            if action["action"] not in ["Post BB", "Post SB", "Post Extra Blind"]:
+                game_states.add_frame()
 
             action_amount = 0
-            action_snapshot["action"] = ""
+            game_states.set("action", "")
 
-    # Check the firsts actions and remove the undesired ones
-    popped = 0
-    for index in states_to_pop: 
-        game_states.pop(index-popped)
-        popped +=1
-
-    
     # Include pot and winnings information at the last state
-    game_states[-1]["final_pots"] = [
+    game_states.deltas[-1]["final_pots"] = [
         {
             "rake": float(pot["rake"]),
             "amount": float(pot["amount"]),
             "player_wins": [
                 {
-                    "name": action_snapshot["players"][id_to_index[win.get("player_id")]]["name"],
+                    "name": state["players"][id_to_index[win.get("player_id")]]["name"],
                     "win_amount": float(win["win_amount"]),
                     "contributed_rake":float(win["contributed_rake"]),
                     "cashout_fee": float(win.get("cashout_fee", 0.00)),
@@ -357,5 +481,7 @@ def get_data_for_replayer(hand_data, amount_in_BB = True):
         }
         for pot in ohh_data["pots"]
     ]
+    if (len(game_states) - 1) % game_states.keyframe_interval == 0: # The last frame is a keyframe
+        game_states.keyframes[-1]["final_pots"] = game_states.deltas[-1]["final_pots"]
 
     return general_data, game_states
@@ -3,8 +3,13 @@ from flask import current_app
 import sqlite3
 import os
 import json
-import pandas as pd
-from app.utils.hand_parser import * 
+import itertools
+from collections import defaultdict, deque
+from contextlib import closing, contextmanager
+from urllib.request import pathname2url
+from concurrent.futures import ProcessPoolExecutor
+from app.utils.hand_parser import *
+from app.utils.ohh_codec import encode_ohh_data, decode_ohh_data 
 
 
 # Database connection helper
@@ -20,13 +25,57 @@ def list_databases(db_directory):
     return [db[:-3] for db in db_files if db.endswith('.db')]
 
 
-
-def init_db(db_path):
-    """Initializes the database with necessary tables."""
+# players_hands, also created under another name as the shadow table of full_update_players_hands
+PLAYERS_HANDS_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        player_id INTEGER,
+        hand_id INTEGER,
+        cards TEXT,
+        hand_class TEXT,
+        position INT,
+        position_name TEXT,
+        profit DECIMAL,
+        ev_profit DECIMAL, -- All-in adjusted profit (see get_allin_ev_profits), NULL for hands imported before it existed
+        rake DECIMAL,
+        participed BOOLEAN,
+        vpip BOOLEAN,
+        pfr BOOLEAN,
+        aggressive INT,
+        passive INT,
+        two_bet_possibility BOOLEAN,
+        limp BOOLEAN,
+        two_bet BOOLEAN,
+        three_bet_possibility BOOLEAN,
+        three_bet BOOLEAN,
+        FOREIGN KEY (player_id) REFERENCES players(id)
+        FOREIGN KEY (hand_id) REFERENCES hands(id)
+    PRIMARY KEY (player_id, hand_id)  -- Ensures each player can participate in each hand only once
+    )"""
+
+# Covering indexes for the statistics queries (see explain_statistics_queries). players(name) is already indexed by its UNIQUE constraint
+# and hands are joined through their INTEGER PRIMARY KEY.
+PLAYERS_HANDS_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS players_hands_statistics ON players_hands (player_id, hand_id, position_name, position, participed, vpip, pfr, aggressive, passive, two_bet_possibility, two_bet, limp, three_bet_possibility, three_bet, profit, rake)",
+    "CREATE INDEX IF NOT EXISTS players_hands_range ON players_hands (player_id, hand_class, position_name, position, vpip, pfr, limp, two_bet_possibility, two_bet, three_bet_possibility, three_bet)", # Range statistics, grouped in index order
+]
+
+
+def init_db(db_path, remove_duplicates=False):
+    """Initializes the database with necessary tables.
+    Databases imported before hands_natural_key can hold the same hand twice : the index is only created after their
+    removal, which deletes rows and is only done with remove_duplicates (the migrate-hands-db command). Otherwise
+    initialization fails with a message asking for the migration."""
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
         try:
-            cursor.executescript("""
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'players_aggregates'")
+            aggregates_exist = cursor.fetchone() is not None
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'hands_search'")
+            search_exists = cursor.fetchone() is not None
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'players_profit_days'")
+            rollups_exist = cursor.fetchone() is not None
+
+            cursor.executescript(f"""
             CREATE TABLE IF NOT EXISTS hands (
                 id INTEGER PRIMARY KEY,
                 game_number TEXT,
@@ -57,30 +106,93 @@ def init_db(db_path):
                 af REAL -- Aggressive factor = (raises + bets) / calls
                 -- We will add more statistics later
             );
-            CREATE TABLE IF NOT EXISTS players_hands (
+            {PLAYERS_HANDS_TABLE.format(table="players_hands")};
+
+            DROP INDEX IF EXISTS players_hands_hand_class; -- Replaced by players_hands_range
+            {"; ".join(PLAYERS_HANDS_INDEXES)};
+            CREATE INDEX IF NOT EXISTS hands_date_time ON hands (date_time); -- Replayer pages, keyed on (date_time, id) since the index entries end with the id
+            CREATE TABLE IF NOT EXISTS players_profit_buckets ( -- Profit of each player by PROFIT_BUCKET_SIZE hands in date order, updated at each import
                 player_id INTEGER,
-                hand_id INTEGER,
-                cards TEXT,
-                hand_class TEXT,
-                position INT,
-                position_name TEXT,
-                profit DECIMAL,
-                rake DECIMAL,
-                participed BOOLEAN,
-                vpip BOOLEAN,
-                pfr BOOLEAN,
-                aggressive INT,
-                passive INT,
-                two_bet_possibility BOOLEAN,
-                limp BOOLEAN,
-                two_bet BOOLEAN,
-                three_bet_possibility BOOLEAN,
-                three_bet BOOLEAN,
+                bucket INTEGER, -- Hands bucket * PROFIT_BUCKET_SIZE to (bucket + 1) * PROFIT_BUCKET_SIZE - 1 of the player
+                hands INTEGER,
+                profit REAL,
+                ev_profit REAL,
+                cum_profit REAL, -- Cumulative profit at the last hand of the bucket
+                cum_ev_profit REAL,
+                last_date_time TEXT, -- Last hand of the bucket, to know if imported hands come after it
+                last_hand_id INTEGER,
+                PRIMARY KEY (player_id, bucket)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS players_profit_days ( -- Profit of each player by day, updated at each import
+                player_id INTEGER,
+                day TEXT,
+                hands INTEGER,
+                profit REAL,
+                ev_profit REAL,
+                cum_hands INTEGER, -- Cumulative values at the end of the day
+                cum_profit REAL,
+                cum_ev_profit REAL,
+                PRIMARY KEY (player_id, day)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS players_aggregates ( -- Running sums updated at each import, used to compute players statistics
+                player_id INTEGER PRIMARY KEY,
+                hands INTEGER,
+                participed INTEGER,
+                vpip INTEGER,
+                pfr INTEGER,
+                aggressive INTEGER,
+                passive INTEGER,
+                profit_bb REAL, -- Sum of the profits in big blinds
                 FOREIGN KEY (player_id) REFERENCES players(id)
-                FOREIGN KEY (hand_id) REFERENCES hands(id)
-            PRIMARY KEY (player_id, hand_id)  -- Ensures each player can participate in each hand only once
             );
+            CREATE TABLE IF NOT EXISTS statistics_generation ( -- Single row, bumped by rebuild_players_statistics
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                generation INTEGER -- Changes when players_hands is rewritten without new hands, caches of the statistics use it with the hands counts
+            );
+            INSERT OR IGNORE INTO statistics_generation (id, generation) VALUES (0, 0);
+
+            -- Trigram index used by the replayer search, it matches any substring of 3 characters or more. Kept in sync with hands by triggers.
+            CREATE VIRTUAL TABLE IF NOT EXISTS hands_search USING fts5(players, table_name, hero_hand_class, tokenize = 'trigram case_sensitive 1');
+            CREATE TRIGGER IF NOT EXISTS hands_search_insert AFTER INSERT ON hands BEGIN
+                INSERT INTO hands_search (rowid, players, table_name, hero_hand_class) VALUES (new.id, new.players, new.table_name, new.hero_hand_class);
+            END;
+            CREATE TRIGGER IF NOT EXISTS hands_search_delete AFTER DELETE ON hands BEGIN
+                DELETE FROM hands_search WHERE rowid = old.id;
+            END;
             """)
+
+            # Hands are identified by their natural key. Duplicates imported before the index existed are removed first.
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'hands_natural_key'")
+            if cursor.fetchone() is None:
+                duplicates = count_duplicate_hands(cursor)
+                if duplicates and not remove_duplicates:
+                    print(f"Database initialization failed: {db_path} holds {duplicates} duplicated hands. "
+                          f"Run 'flask migrate-hands-db --db {db_path}' to remove them.")
+                    return 0
+                if duplicates:
+                    remove_duplicate_hands(cursor)
+                    # Statistics of existing databases counted the removed hands, they are recomputed below
+                    aggregates_exist = False
+                    rollups_exist = False
+                cursor.execute("CREATE UNIQUE INDEX hands_natural_key ON hands (game_number, site_name, table_name)")
+
+            # Add the columns created after the database. Their values are computed by full_update_players_hands
+            cursor.execute("SELECT name FROM pragma_table_info('players_hands')")
+            if "ev_profit" not in {row["name"] for row in cursor.fetchall()}:
+                cursor.execute("ALTER TABLE players_hands ADD COLUMN ev_profit DECIMAL")
+
+            # Index the hands of databases created before hands_search existed
+            if not search_exists:
+                cursor.execute("INSERT INTO hands_search (rowid, players, table_name, hero_hand_class) SELECT id, players, table_name, hero_hand_class FROM hands")
+
+            # Fill the aggregates of databases created before players_aggregates existed
+            if not aggregates_exist:
+                rebuild_players_statistics(cursor)
+
+            # Fill the profit rollups of databases created before them
+            if not rollups_exist:
+                rebuild_players_profit_rollups(cursor)
+
             conn.commit()
             print("Database initialized successfully.")
 
@@ -89,95 +201,445 @@ def init_db(db_path):
             print("Database initialization failed:", e)
             return 0
 
-def save_hands_bulk(hand_data_list, db_path):
-    """Inserts multiple hands and associated player data in a single transaction."""
+# Columns written by the bulk loaders. They need to match the keys returned by parse_hand_at_upload
+HANDS_COLUMNS = ["game_number", "site_name", "table_name", "date_time", "table_size", "number_players",
+                 "small_blind_amount", "big_blind_amount", "observed", "hero_name", "hero_cards", "hero_hand_class",
+                 "hero_position", "hero_profit", "flop", "players", "ohh_data"]
+PLAYERS_HANDS_COLUMNS = ["cards", "hand_class", "position", "position_name", "profit", "ev_profit", "rake", "participed", "vpip", "pfr",
+                         "aggressive", "passive", "two_bet_possibility", "limp", "two_bet", "three_bet_possibility", "three_bet"]
+
+HANDS_INSERT = f"INSERT INTO hands ({', '.join(HANDS_COLUMNS)}) VALUES ({', '.join('?' * len(HANDS_COLUMNS))})"
+PLAYERS_HANDS_INSERT_INTO = (f"INSERT INTO {{table}} (player_id, hand_id, {', '.join(PLAYERS_HANDS_COLUMNS)}) "
+                             f"VALUES ({', '.join('?' * (len(PLAYERS_HANDS_COLUMNS) + 2))})")
+PLAYERS_HANDS_INSERT = PLAYERS_HANDS_INSERT_INTO.format(table="players_hands")
+
+# PRAGMAs for bulk loads, opt-in through the IMPORT_PRAGMAS config of the import-hands command. They trade durability
+# for speed : with synchronous=OFF a power loss during an import can corrupt the database, an application crash can't.
+LOAD_PRAGMAS = {"journal_mode": "WAL", "synchronous": "OFF"}
+
+def apply_pragmas(conn, pragmas):
+    """Applies a dictionary of PRAGMAs to the connection. Returns their previous values."""
+    previous = {}
+    for name, value in (pragmas or {}).items():
+        if not name.isidentifier():
+            raise ValueError(f"Invalid PRAGMA name: {name}")
+        previous[name] = conn.execute(f"PRAGMA {name}").fetchone()[0]
+        conn.execute(f"PRAGMA {name} = {value}")
+    return previous
+
+@contextmanager
+def load_pragmas(conn, pragmas):
+    """Applies the PRAGMAs to the connection for the duration of a load, then restores their previous values.
+    journal_mode is persistent, so without this an import would leave the database in WAL mode."""
+    previous = apply_pragmas(conn, pragmas)
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction: # Left uncommitted by an error. journal_mode can't change inside a transaction
+            conn.rollback()
+        try:
+            apply_pragmas(conn, previous)
+        except sqlite3.OperationalError as e: # Leaving WAL mode needs the other connections to be closed
+            print(f"Could not restore the PRAGMAs {previous}: {e}")
+
+def resolve_player_ids(cursor, names):
+    """Returns a dictionary name -> player id, inserting the unknown players with one set based upsert."""
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS import_players (name TEXT PRIMARY KEY)")
+    cursor.execute("DELETE FROM import_players")
+    cursor.executemany("INSERT INTO import_players (name) VALUES (?)", [(name,) for name in names])
+    cursor.execute("INSERT INTO players (name) SELECT name FROM import_players WHERE true ON CONFLICT (name) DO NOTHING")
+    cursor.execute("SELECT p.name, p.id FROM players p JOIN import_players i ON i.name = p.name")
+    return dict(cursor.fetchall())
+
+# Players statistics computed from players_aggregates. The ids of the players to update are given by the ids subquery
+PLAYERS_STATISTICS_UPDATE = """
+UPDATE players
+SET hands = a.hands,
+    vpip = ROUND(CAST(a.vpip AS FLOAT) / CAST(a.participed AS FLOAT)*100,2),
+    pfr = ROUND(CAST(a.pfr AS FLOAT) / CAST(a.participed AS FLOAT)*100,2),
+    win_rate = ROUND(a.profit_bb / a.hands,2),
+    af = ROUND(CAST(a.aggressive AS FLOAT) / CAST(a.passive AS FLOAT),2)
+FROM players_aggregates a
+WHERE players.id = a.player_id AND players.id IN ({ids})
+"""
+
+def update_players_aggregates(cursor, hands_dics, players_hands_dics, name_to_id):
+    """Adds the hands of the batch to the running sums of players_aggregates and refreshes the statistics of the players of the batch."""
+    totals = defaultdict(lambda: [0, 0, 0, 0, 0, 0, 0.0])
+    for hand, players_hands in zip(hands_dics, players_hands_dics):
+        big_blind = float(hand["big_blind_amount"])
+        for name, data in players_hands.items():
+            total = totals[name_to_id[name]]
+            total[0] += 1
+            total[1] += data["participed"]
+            total[2] += data["vpip"]
+            total[3] += data["pfr"]
+            total[4] += data["aggressive"]
+            total[5] += data["passive"]
+            total[6] += float(data["profit"]) / big_blind
+
+    cursor.executemany("""
+    INSERT INTO players_aggregates (player_id, hands, participed, vpip, pfr, aggressive, passive, profit_bb)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (player_id) DO UPDATE SET
+        hands = hands + excluded.hands,
+        participed = participed + excluded.participed,
+        vpip = vpip + excluded.vpip,
+        pfr = pfr + excluded.pfr,
+        aggressive = aggressive + excluded.aggressive,
+        passive = passive + excluded.passive,
+        profit_bb = profit_bb + excluded.profit_bb
+    """, [(player_id, *total) for player_id, total in totals.items()])
+
+    # The players of the batch are in import_players, filled by resolve_player_ids
+    cursor.execute(PLAYERS_STATISTICS_UPDATE.format(ids="SELECT p.id FROM players p JOIN import_players i ON i.name = p.name"))
+
+def rebuild_players_statistics(cursor):
+    """Recomputes players_aggregates from the whole players_hands table, then the statistics of every player.
+    players_hands can have been rewritten with the same hands (full_update_players_hands), so the statistics generation is bumped."""
+    cursor.execute("UPDATE statistics_generation SET generation = generation + 1")
+    cursor.execute("DELETE FROM players_aggregates")
+    cursor.execute("""
+    INSERT INTO players_aggregates (player_id, hands, participed, vpip, pfr, aggressive, passive, profit_bb)
+    SELECT player_id,
+           COUNT(ph.hand_id),
+           SUM(ph.participed),
+           SUM(ph.vpip),
+           SUM(ph.pfr),
+           SUM(ph.aggressive),
+           SUM(ph.passive),
+           SUM(ph.profit / h.big_blind_amount)
+    FROM players_hands ph JOIN hands h ON ph.hand_id == h.id
+    GROUP BY player_id
+    """)
+    cursor.execute(PLAYERS_STATISTICS_UPDATE.format(ids="SELECT player_id FROM players_aggregates"))
+
+PROFIT_BUCKET_SIZE = 100 # Hands per row of players_profit_buckets
+
+# Profit of the players of the ids subquery by bucket of PROFIT_BUCKET_SIZE hands, from their whole history.
+# The bare columns of the rows aggregated with MAX(n) are taken from the last hand of the bucket.
+PROFIT_BUCKETS_REBUILD = f"""
+INSERT INTO players_profit_buckets (player_id, bucket, hands, profit, ev_profit, cum_profit, cum_ev_profit, last_date_time, last_hand_id)
+SELECT player_id, bucket, hands, profit, ev_profit, cum_profit, cum_ev_profit, date_time, hand_id
+FROM (
+    SELECT player_id, n / {PROFIT_BUCKET_SIZE} AS bucket, COUNT(*) AS hands, SUM(profit) AS profit, SUM(ev_profit) AS ev_profit,
+           MAX(n), cum_profit, cum_ev_profit, date_time, hand_id
+    FROM (
+        SELECT ph.player_id, ph.hand_id, h.date_time, ph.profit, COALESCE(ph.ev_profit, ph.profit) AS ev_profit,
+               ROW_NUMBER() OVER w - 1 AS n,
+               SUM(ph.profit) OVER w AS cum_profit,
+               SUM(COALESCE(ph.ev_profit, ph.profit)) OVER w AS cum_ev_profit
+        FROM players_hands ph JOIN hands h ON h.id == ph.hand_id
+        WHERE ph.player_id IN ({{ids}})
+        WINDOW w AS (PARTITION BY ph.player_id ORDER BY h.date_time, ph.hand_id)
+    )
+    GROUP BY player_id, bucket
+)
+"""
+
+# Adds the hands of import_profits to the buckets of their players, after the last bucketed hand.
+# The last bucket of a player is completed first, then new buckets are created.
+PROFIT_BUCKETS_APPEND = f"""
+INSERT INTO players_profit_buckets (player_id, bucket, hands, profit, ev_profit, cum_profit, cum_ev_profit, last_date_time, last_hand_id)
+SELECT player_id, bucket, hands, profit, ev_profit, cum_profit, cum_ev_profit, date_time, hand_id
+FROM (
+    SELECT player_id, n / {PROFIT_BUCKET_SIZE} AS bucket, COUNT(*) AS hands, SUM(profit) AS profit, SUM(ev_profit) AS ev_profit,
+           MAX(n), cum_profit, cum_ev_profit, date_time, hand_id
+    FROM (
+        SELECT i.player_id, i.hand_id, i.date_time, i.profit, i.ev_profit,
+               COALESCE(b.bucket * {PROFIT_BUCKET_SIZE} + b.hands, 0) + ROW_NUMBER() OVER w - 1 AS n,
+               COALESCE(b.cum_profit, 0) + SUM(i.profit) OVER w AS cum_profit,
+               COALESCE(b.cum_ev_profit, 0) + SUM(i.ev_profit) OVER w AS cum_ev_profit
+        FROM import_profits i
+        LEFT JOIN players_profit_buckets b ON b.player_id == i.player_id
+            AND b.bucket == (SELECT MAX(bucket) FROM players_profit_buckets WHERE player_id == i.player_id)
+        WHERE i.player_id NOT IN (SELECT player_id FROM rebuilt_profits)
+        WINDOW w AS (PARTITION BY i.player_id ORDER BY i.date_time, i.hand_id)
+    )
+    GROUP BY player_id, bucket
+)
+WHERE true
+ON CONFLICT (player_id, bucket) DO UPDATE SET
+    hands = hands + excluded.hands,
+    profit = profit + excluded.profit,
+    ev_profit = ev_profit + excluded.ev_profit,
+    cum_profit = excluded.cum_profit,
+    cum_ev_profit = excluded.cum_ev_profit,
+    last_date_time = excluded.last_date_time,
+    last_hand_id = excluded.last_hand_id
+"""
+
+# Cumulative values of the days of the players of the first_days subquery, (player_id, first_day), from their first_day.
+# The days before it are unchanged and give the starting values.
+PROFIT_DAYS_CUMULATIVE_UPDATE = """
+UPDATE players_profit_days
+SET cum_hands = c.cum_hands,
+    cum_profit = c.cum_profit,
+    cum_ev_profit = c.cum_ev_profit
+FROM (
+    SELECT d.player_id, d.day,
+           COALESCE(p.cum_hands, 0) + SUM(d.hands) OVER w AS cum_hands,
+           COALESCE(p.cum_profit, 0) + SUM(d.profit) OVER w AS cum_profit,
+           COALESCE(p.cum_ev_profit, 0) + SUM(d.ev_profit) OVER w AS cum_ev_profit
+    FROM ({first_days}) f
+    JOIN players_profit_days d ON d.player_id == f.player_id AND d.day >= f.first_day
+    LEFT JOIN players_profit_days p ON p.player_id == f.player_id
+        AND p.day == (SELECT MAX(day) FROM players_profit_days WHERE player_id == f.player_id AND day < f.first_day)
+    WINDOW w AS (PARTITION BY d.player_id ORDER BY d.day)
+) c
+WHERE players_profit_days.player_id == c.player_id AND players_profit_days.day == c.day
+"""
+
+def update_players_profit_rollups(cursor, hand_ids, hands_dics, players_hands_dics, name_to_id):
+    """Adds the hands of the batch to players_profit_buckets and players_profit_days. Buckets are appended to, except
+    for the players with imported hands older than their last bucketed hand, whose buckets are rebuilt."""
+    cursor.execute("""
+    CREATE TEMP TABLE IF NOT EXISTS import_profits (
+        player_id INTEGER,
+        hand_id INTEGER,
+        date_time TEXT,
+        profit REAL,
+        ev_profit REAL
+    )""")
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS rebuilt_profits (player_id INTEGER PRIMARY KEY)")
+    cursor.execute("DELETE FROM import_profits")
+    cursor.execute("DELETE FROM rebuilt_profits")
+    cursor.executemany("INSERT INTO import_profits VALUES (?, ?, ?, ?, ?)", [
+        (name_to_id[name], hand_id, hand["date_time"], data["profit"], data["ev_profit"] if data.get("ev_profit") is not None else data["profit"])
+        for hand_id, hand, players_hands in zip(hand_ids, hands_dics, players_hands_dics)
+        for name, data in players_hands.items()
+    ])
+
+    # Hands by bucket
+    cursor.execute("""
+    INSERT INTO rebuilt_profits (player_id)
+    SELECT DISTINCT i.player_id FROM import_profits i
+    JOIN players_profit_buckets b ON b.player_id == i.player_id
+        AND b.bucket == (SELECT MAX(bucket) FROM players_profit_buckets WHERE player_id == i.player_id)
+    WHERE (i.date_time, i.hand_id) < (b.last_date_time, b.last_hand_id)
+    """)
+    cursor.execute("DELETE FROM players_profit_buckets WHERE player_id IN (SELECT player_id FROM rebuilt_profits)")
+    cursor.execute(PROFIT_BUCKETS_REBUILD.format(ids="SELECT player_id FROM rebuilt_profits"))
+    cursor.execute(PROFIT_BUCKETS_APPEND)
+
+    # Days
+    cursor.execute("""
+    INSERT INTO players_profit_days (player_id, day, hands, profit, ev_profit)
+    SELECT player_id, substr(date_time, 1, 10), COUNT(*), SUM(profit), SUM(ev_profit)
+    FROM import_profits
+    GROUP BY player_id, substr(date_time, 1, 10)
+    ON CONFLICT (player_id, day) DO UPDATE SET
+        hands = hands + excluded.hands,
+        profit = profit + excluded.profit,
+        ev_profit = ev_profit + excluded.ev_profit
+    """)
+    cursor.execute(PROFIT_DAYS_CUMULATIVE_UPDATE.format(
+        first_days="SELECT player_id, MIN(substr(date_time, 1, 10)) AS first_day FROM import_profits GROUP BY player_id"))
+
+def rebuild_players_profit_rollups(cursor):
+    """Recomputes players_profit_buckets and players_profit_days from the whole players_hands table."""
+    cursor.execute("DELETE FROM players_profit_buckets")
+    cursor.execute(PROFIT_BUCKETS_REBUILD.format(ids="SELECT id FROM players"))
+    cursor.execute("DELETE FROM players_profit_days")
+    cursor.execute("""
+    INSERT INTO players_profit_days (player_id, day, hands, profit, ev_profit)
+    SELECT ph.player_id, substr(h.date_time, 1, 10), COUNT(*), SUM(ph.profit), SUM(COALESCE(ph.ev_profit, ph.profit))
+    FROM players_hands ph JOIN hands h ON h.id == ph.hand_id
+    GROUP BY ph.player_id, substr(h.date_time, 1, 10)
+    """)
+    cursor.execute(PROFIT_DAYS_CUMULATIVE_UPDATE.format(first_days="SELECT id AS player_id, '' AS first_day FROM players"))
+
+def count_duplicate_hands(cursor):
+    """Returns the number of hands stored more than once, not counting their first import."""
+    cursor.execute("SELECT COUNT(*) AS duplicates FROM hands WHERE id NOT IN (SELECT MIN(id) FROM hands GROUP BY game_number, site_name, table_name)")
+    return cursor.fetchone()["duplicates"]
+
+def remove_duplicate_hands(cursor):
+    """Removes the hands (and their players_hands rows) stored more than once, keeping the first imported one."""
+    duplicates = """
+    SELECT id FROM hands
+    WHERE id NOT IN (SELECT MIN(id) FROM hands GROUP BY game_number, site_name, table_name)
+    """
+    cursor.execute(f"DELETE FROM players_hands WHERE hand_id IN ({duplicates})")
+    cursor.execute(f"DELETE FROM hands WHERE id IN ({duplicates})")
+    if cursor.rowcount:
+        print(f"Removed {cursor.rowcount} duplicated hands.")
+
+def find_stored_keys(cursor, keys):
+    """Returns the positions in keys of the natural keys (game_number, site_name, table_name) already stored in the database.
+    The keys are probed with a single join against the natural key index instead of one query per hand."""
+    cursor.execute("""
+    CREATE TEMP TABLE IF NOT EXISTS import_keys (
+        position INTEGER PRIMARY KEY,
+        game_number TEXT,
+        site_name TEXT,
+        table_name TEXT
+    )""")
+    cursor.execute("DELETE FROM import_keys")
+    cursor.executemany("INSERT INTO import_keys VALUES (?, ?, ?, ?)", [(position, *key) for position, key in enumerate(keys)])
+    cursor.execute("""
+    SELECT k.position FROM import_keys k
+    JOIN hands h ON h.game_number = k.game_number AND h.site_name = k.site_name AND h.table_name = k.table_name
+    """)
+    return {row[0] for row in cursor.fetchall()}
+
+def filter_new_hands(cursor, hands_dics, players_hands_dics):
+    """Drops the hands already stored in the database or repeated in the batch."""
+    keys = [(str(hand["game_number"]), hand["site_name"], hand["table_name"]) for hand in hands_dics]
+    stored = find_stored_keys(cursor, keys)
+
+    new_hands_dics = []
+    new_players_hands_dics = []
+    seen = set()
+    for position, (key, hand, players_hands) in enumerate(zip(keys, hands_dics, players_hands_dics)):
+        if position in stored or key in seen:
+            continue
+        seen.add(key)
+        new_hands_dics.append(hand)
+        new_players_hands_dics.append(players_hands)
+
+    return new_hands_dics, new_players_hands_dics
+
+def parse_hands_chunk(hand_data_list, compress_ohh=True, allin_ev_samples=None, db_path=None):
+    """Parses a chunk of hands and returns the rows to insert. Hands can be OHH dictionaries or their raw JSON text. This function is run by the import workers.
+    allin_ev_samples is the number of samples of the all-in equities, see ALLIN_EV_SAMPLES.
+    With db_path, the hands already stored there or repeated in the chunk are dropped before they are parsed, through a
+    read-only connection of the worker, so re-importing a file doesn't pay the parsing (and the all-in equity) of its
+    stored hands. insert_parsed_hands still filters the parsed hands, for the hands stored in the meantime."""
+    hand_data_list = [json.loads(hand_data) if isinstance(hand_data, str) else hand_data for hand_data in hand_data_list]
+    if db_path is not None:
+        keys = [(str(hand_data["ohh"]["game_number"]), hand_data["ohh"].get("site_name"), hand_data["ohh"].get("table_name"))
+                for hand_data in hand_data_list]
+        with closing(sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True)) as conn:
+            stored = find_stored_keys(conn.cursor(), keys)
+        seen = set()
+        new_hand_data = []
+        for position, (key, hand_data) in enumerate(zip(keys, hand_data_list)):
+            if position in stored or key in seen:
+                continue
+            seen.add(key)
+            new_hand_data.append(hand_data)
+        hand_data_list = new_hand_data
 
     hands_dics = []
-    players = set()
     players_hands_dics = []
 
-    # Collect data for all hands and players in the batch
     for hand_data in hand_data_list:
-        hands_data, players_hands_data = parse_hand_at_upload(hand_data)
+        hands_data, players_hands_data = parse_hand_at_upload(hand_data, allin_ev_samples)
         if players_hands_data is None:
             continue  # Skip anonymous hands
-        
-        # Check if hand already exists in database, if it's the case, skip the hand
-        # TODO find a way to do it fast because it causes a lot of delay per file
-        #game_number = hands_data["game_number"]
-        #site_name = hands_data["game_number"]
-        #table_name = hands_data["table_name"]
-        #cursor.execute("SELECT id FROM hands WHERE game_number = ? AND site_name = ? AND table_name = ?", (game_number, site_name, table_name))
-        #if cursor.fetchone(): continue
-        
-        hands_data["ohh_data"] = json.dumps(hand_data)
+
+        hands_data["ohh_data"] = encode_ohh_data(hand_data, compress_ohh)
         hands_dics.append(hands_data)
         players_hands_dics.append(players_hands_data)
-            
-        #Add players name to players set
-        for name in players_hands_data.keys(): players.add(name)
 
+    return hands_dics, players_hands_dics
+
+def insert_parsed_hands(conn, hands_dics, players_hands_dics):
+    """Inserts hands parsed by parse_hands_chunk and their players data, skipping the hands already stored. Returns the number of inserted hands. The caller is responsible for the commit."""
     if not players_hands_dics : # If the list is empty it means that all games are annonymous
-        return
+        return 0
 
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
+    cursor = conn.cursor()
+
+    # Skip the hands that are already in the database
+    hands_dics, players_hands_dics = filter_new_hands(cursor, hands_dics, players_hands_dics)
+    if not hands_dics:
+        return 0
 
-        # Fetch the current max ID from the `hands` table directly
-        cursor.execute("SELECT MAX(id) FROM hands")
-        max_id = cursor.fetchone()[0] or 0  # Set to 0 if there are no rows
-
-        # Generate hands dataframe from list of dictionaries
-        hands_df = pd.DataFrame.from_dict(hands_dics)
-
-        # Insert hands dataframe into hands table
-        hands_df.to_sql(
-            name = 'hands',# Name of SQL table.
-            con = conn, # sqlalchemy.engine.Engine or sqlite3.Connection
-            if_exists='append', # How to behave if the table already exists. You can use 'replace', 'append' to replace it.
-            index=False, # It means index of DataFrame will save. Set False to ignore the index of DataFrame.
-            chunksize= 999 // (len(hands_df.columns)+1), # If DataFrame is big, this parameter is needed 
-            method="multi" # For inserting with executemany
-        )
-
-        # Calculate new hand IDs starting from max_id + 1
-        hand_ids = range(max_id + 1, max_id + 1 + len(hands_dics))
-
-        # Retrieve player_id or insert player and get id
-        name_to_id = {}
-        for name in players:
-            cursor.execute("SELECT id FROM players WHERE name = ?", (name,))
-            result = cursor.fetchone()
-            if result:
-                name_to_id[name] = result[0]  # Existing player ID
-            else:
-                cursor.execute("INSERT INTO players (name) VALUES (?)", (name,))
-                name_to_id[name] = cursor.lastrowid  # New player ID
-
-        # Prepare players_hands dataframe by using hands_ids and name_to_id
-        players_hands_df_list = []
-        for hand_id, players_hands in zip(hand_ids, players_hands_dics) : 
-            df = pd.DataFrame(data = players_hands).T.reset_index(names = 'player_id')
-            df['player_id'] = df['player_id'].apply(lambda name : name_to_id[name])
-            df["hand_id"] = hand_id
-            players_hands_df_list.append(df)
-
-        players_hands_df = pd.concat(players_hands_df_list, ignore_index=True)
-
-        # Insert players_hands dataframe into players_hands table
-        players_hands_df.to_sql(
-            name = 'players_hands',# Name of SQL table.
-            con = conn, # sqlalchemy.engine.Engine or sqlite3.Connection
-            if_exists='append', # How to behave if the table already exists. You can use 'replace', 'append' to replace it.
-            index=False, # It means index of DataFrame will save. Set False to ignore the index of DataFrame.
-            chunksize= 999 // (len(players_hands_df.columns)+1), # If DataFrame is big, this parameter is needed 
-            method="multi" # For inserting with executemany
-        )
+    # Fetch the current max ID from the `hands` table directly
+    cursor.execute("SELECT MAX(id) FROM hands")
+    max_id = cursor.fetchone()[0] or 0  # Set to 0 if there are no rows
 
+    # Insert hands rows
+    cursor.executemany(HANDS_INSERT, [tuple(hand.get(column) for column in HANDS_COLUMNS) for hand in hands_dics])
+
+    # Calculate new hand IDs starting from max_id + 1
+    hand_ids = range(max_id + 1, max_id + 1 + len(hands_dics))
+
+    # Retrieve player_id or insert player and get id
+    players = {name for players_hands_data in players_hands_dics for name in players_hands_data}
+    name_to_id = resolve_player_ids(cursor, players)
+
+    # Insert players_hands rows by using hands_ids and name_to_id
+    cursor.executemany(PLAYERS_HANDS_INSERT, [
+        (name_to_id[name], hand_id, *(data[column] for column in PLAYERS_HANDS_COLUMNS))
+        for hand_id, players_hands in zip(hand_ids, players_hands_dics)
+        for name, data in players_hands.items()
+    ])
+
+    # Keep players statistics up to date without scanning the hand history
+    update_players_aggregates(cursor, hands_dics, players_hands_dics, name_to_id)
+    update_players_profit_rollups(cursor, hand_ids, hands_dics, players_hands_dics, name_to_id)
+
+    return len(hands_dics)
+
+def save_hands_bulk(hand_data_list, db_path, pragmas=None, compress_ohh=True, allin_ev_samples=None):
+    """Inserts multiple hands and associated player data in a single transaction. Hands already in the database are skipped."""
+    with sqlite3.connect(db_path) as conn, load_pragmas(conn, pragmas):
+        hands_dics, players_hands_dics = parse_hands_chunk(hand_data_list, compress_ohh, allin_ev_samples, db_path)
+
+        if not players_hands_dics : # If the list is empty it means that all games are annonymous or already stored
+            return
+
+        insert_parsed_hands(conn, hands_dics, players_hands_dics)
         conn.commit()  # Single commit for the entire bulk
 
     return
 
+def iter_ohh_blocks(file_path):
+    """Lazily yields the JSON text of each hand of an OHH file. Hands are separated by a blank line, as written by Session.save_to_OHH."""
+    lines = []
+    with open(file_path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            if line.strip():
+                lines.append(line)
+            elif lines:
+                yield "".join(lines)
+                lines = []
+    if lines: # Last hand if the file doesn't end with a blank line
+        yield "".join(lines)
+
+def save_hands_stream(file_paths, db_path, chunk_size=500, workers=None, max_pending_chunks=None, progress=None, pragmas=None, compress_ohh=True, allin_ev_samples=None):
+    """Streams the hands of OHH files into the database.
+    Hands are read lazily, parsed by chunks of chunk_size in a process pool and committed one chunk per transaction.
+    At most max_pending_chunks chunks are read ahead of the database writer, so memory stays bounded whatever the size of the files.
+    progress is an optional callable receiving the number of hands inserted so far.
+    pragmas are applied to the loading connection for the duration of the load, see LOAD_PRAGMAS.
+    compress_ohh selects the storage format of ohh_data, see encode_ohh_data.
+    allin_ev_samples is the number of samples of the all-in equities, see ALLIN_EV_SAMPLES.
+    Returns the number of inserted hands."""
+    if isinstance(file_paths, (str, os.PathLike)):
+        file_paths = [file_paths]
+    workers = workers or os.cpu_count() or 1
+    max_pending_chunks = max_pending_chunks or 2 * workers
+
+    blocks = itertools.chain.from_iterable(iter_ohh_blocks(path) for path in file_paths)
+    chunks = iter(lambda: list(itertools.islice(blocks, chunk_size)), [])
+
+    inserted = 0
+    pending = deque() # Futures in submission order, so hands are inserted in file order
+
+    def write_oldest():
+        nonlocal inserted
+        hands_dics, players_hands_dics = pending.popleft().result()
+        inserted += insert_parsed_hands(conn, hands_dics, players_hands_dics)
+        conn.commit()
+        if progress is not None:
+            progress(inserted)
+
+    with sqlite3.connect(db_path) as conn, load_pragmas(conn, pragmas), ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in chunks:
+            # The workers drop the stored hands before parsing them, the writer only inserts
+            pending.append(executor.submit(parse_hands_chunk, chunk, compress_ohh, allin_ev_samples, db_path))
+            # Backpressure : wait for the writer before reading more hands
+            if len(pending) >= max_pending_chunks:
+                write_oldest()
+        while pending:
+            write_oldest()
+
+    return inserted
+
 def load_hands_from_db(db_path):
     """Loads all hands from the database for display or analysis."""
     with get_db_connection(db_path) as conn:
@@ -232,29 +694,22 @@ def load_hands_from_db_old(db_path):
     return hands
 
 def update_players_statistics(db_path):
-    """Updates player statistics based on records in players_hands."""
+    """Recomputes player statistics from scratch based on records in players_hands. Imports keep them up to date, use this only to repair them."""
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-        UPDATE players
-        SET hands = result.hands,
-            vpip = result.VPIP,
-            pfr = result.PFR,
-            win_rate = result.bb_per_hand,
-            af = result.AF
-        FROM (SELECT player_id,
-                     COUNT(ph.hand_id) AS hands,
-                     ROUND(CAST(SUM(ph.vpip) AS FLOAT) / CAST(SUM(ph.participed) AS FLOAT)*100,2) AS VPIP,
-                     ROUND(CAST(SUM(ph.pfr) AS FLOAT) / CAST(SUM(ph.participed) AS FLOAT)*100,2) AS PFR,
-                     ROUND(CAST(SUM(ph.aggressive) AS FLOAT) / CAST(SUM(ph.passive) AS FLOAT),2) AS AF,
-                     ROUND(AVG(profit) / h.big_blind_amount,2) AS bb_per_hand
-              FROM players_hands ph JOIN hands h on ph.hand_id == h.id
-              GROUP BY player_id)
-        AS result
-        WHERE players.id = result.player_id
-        """)
+        rebuild_players_statistics(cursor)
+        rebuild_players_profit_rollups(cursor)
         conn.commit()
 
+def get_statistics_version(db_path, player_name):
+    """Returns the version of the statistics of the player : its hands count, changed by the imports, and the statistics
+    generation, changed when players_hands is rebuilt. None if the player doesn't exist."""
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT p.hands, g.generation FROM players p, statistics_generation g WHERE p.name = ?", (player_name,))
+        row = cursor.fetchone()
+    return (row["hands"], row["generation"]) if row else None
+
 def get_players_list(db_path):
     """Retrieves players from the database."""
     with get_db_connection(db_path) as conn:
@@ -263,27 +718,112 @@ def get_players_list(db_path):
         players = cursor.fetchall()
         return players
 
+# Statistics queries. They are kept as constants so explain_statistics_queries checks exactly what is run.
+PLAYER_STATISTICS_PER_POSITION_QUERY = """
+SELECT 
+ph.position_name AS position,
+COUNT(ph.hand_id) AS hands,
+ROUND(CAST(SUM(ph.vpip) AS FLOAT) / CAST(SUM(ph.participed) AS FLOAT)*100,2) AS VPIP,
+ROUND(CAST(SUM(ph.pfr) AS FLOAT) / CAST(SUM(ph.participed) AS FLOAT)*100,2) AS PFR,
+ROUND(CAST(SUM(ph.aggressive) AS FLOAT) / CAST(SUM(ph.passive) AS FLOAT),2) AS AF,
+ROUND(CAST(SUM(ph.two_bet) AS FLOAT) / CAST(SUM(ph.two_bet_possibility) AS FLOAT)*100,2) AS two_bet,
+ROUND(CAST(SUM(ph.limp) AS FLOAT) / CAST(SUM(ph.two_bet_possibility) AS FLOAT)*100,2) AS limp,
+ROUND(CAST(SUM(ph.three_bet) AS FLOAT) / CAST(SUM(ph.three_bet_possibility) AS FLOAT)*100,2) AS three_bet,
+ROUND(AVG(profit) / h.big_blind_amount,2) AS bb_per_hand
+FROM players_hands ph JOIN hands h ON h.id == ph.hand_id JOIN players p ON p.id == ph.player_id
+WHERE p.name == ? AND h.number_players >= ? AND  h.number_players <= ? 
+GROUP BY position_name 
+ORDER BY MAX(ph.position) DESC
+"""
+
+PLAYER_FULL_STATISTICS_QUERY = """
+SELECT 
+COUNT(ph.hand_id) AS hands,
+ROUND(CAST(SUM(ph.vpip) AS FLOAT) / CAST(SUM(ph.participed) AS FLOAT)*100,2) AS VPIP,
+ROUND(CAST(SUM(ph.pfr) AS FLOAT) / CAST(SUM(ph.participed) AS FLOAT)*100,2) AS PFR,
+ROUND(CAST(SUM(ph.aggressive) AS FLOAT) / CAST(SUM(ph.passive) AS FLOAT),2) AS AF,
+ROUND(CAST(SUM(ph.two_bet) AS FLOAT) / CAST(SUM(ph.two_bet_possibility) AS FLOAT)*100,2) AS two_bet,
+ROUND(CAST(SUM(ph.limp) AS FLOAT) / CAST(SUM(ph.two_bet_possibility) AS FLOAT)*100,2) AS limp,
+ROUND(CAST(SUM(ph.three_bet) AS FLOAT) / CAST(SUM(ph.three_bet_possibility) AS FLOAT)*100,2) AS three_bet,
+ROUND(SUM(CASE WHEN profit > 0 THEN profit ELSE 0 END) + SUM(rake), 2) AS total_won,
+ROUND(SUM(CASE WHEN profit < 0 THEN profit ELSE 0 END),2) AS total_lost,
+ROUND(SUM(rake),2) AS total_rake,
+ROUND(SUM(profit),2) AS profit,
+ROUND(AVG(rake)/h.big_blind_amount*100,2) AS rake_bb_per_100hand,
+ROUND(AVG(profit)/h.big_blind_amount,2) AS bb_per_hand
+FROM players_hands ph JOIN hands h ON h.id == ph.hand_id JOIN players p ON p.id == ph.player_id
+WHERE p.name == ? AND h.number_players >= ? AND  h.number_players <= ? 
+"""
+
+PLAYER_PROFIT_HISTORIQUE_QUERY = """
+SELECT h.date_time AS date_time,
+       ph.hand_id AS hand_id,
+       ph.profit AS profit,
+       COALESCE(ph.ev_profit, ph.profit) AS ev_profit
+FROM players p
+JOIN players_hands ph ON p.id = ph.player_id
+JOIN hands h ON ph.hand_id = h.id
+WHERE p.name == ?
+"""
+
+PLAYER_PROFIT_BUCKETS_QUERY = """
+SELECT b.bucket * ? + b.hands AS hands, b.cum_profit AS cum_profit, b.cum_ev_profit AS cum_ev_profit
+FROM players_profit_buckets b
+WHERE b.player_id == (SELECT id FROM players WHERE name == ?)
+ORDER BY b.bucket
+"""
+
+PLAYER_PROFIT_DAYS_QUERY = """
+SELECT d.day AS day, d.cum_hands AS hands, d.cum_profit AS cum_profit, d.cum_ev_profit AS cum_ev_profit
+FROM players_profit_days d
+WHERE d.player_id == (SELECT id FROM players WHERE name == ?)
+ORDER BY d.day
+"""
+
+RANGE_STATISTICS_QUERY = """
+SELECT position_name,
+       position,
+       hand_class,
+       COUNT(*) AS hands,
+       SUM(vpip) AS vpip,
+       SUM(pfr) AS pfr,
+       SUM(limp) AS limp,
+       SUM(two_bet_possibility) AS two_bet_possibility,
+       SUM(two_bet) AS two_bet,
+       SUM(three_bet_possibility) AS three_bet_possibility,
+       SUM(three_bet) AS three_bet
+FROM players_hands
+WHERE player_id == (SELECT id FROM players WHERE name == ?) AND hand_class IS NOT NULL
+GROUP BY hand_class, position_name, position -- In the order of players_hands_range, position_name first would make the position statistics use this index
+"""
+
+# Queries checked by explain_statistics_queries, with placeholder arguments
+STATISTICS_QUERIES = {
+    "get_player_statistics_per_position": (PLAYER_STATISTICS_PER_POSITION_QUERY, ("", 2, 6)),
+    "get_player_full_statistics": (PLAYER_FULL_STATISTICS_QUERY, ("", 2, 6)),
+    "get_player_profit_historique": (PLAYER_PROFIT_HISTORIQUE_QUERY, ("",)),
+    "get_range_statistics": (RANGE_STATISTICS_QUERY, ("",)),
+    "get_player_profit_buckets": (PLAYER_PROFIT_BUCKETS_QUERY, (PROFIT_BUCKET_SIZE, "")),
+    "get_player_profit_days": (PLAYER_PROFIT_DAYS_QUERY, ("",)),
+}
+
+def explain_statistics_queries(db_path):
+    """Runs EXPLAIN QUERY PLAN on the statistics queries.
+    Returns a dictionary query name -> (plan lines, full scans), where full scans are the plan lines scanning a whole table."""
+    plans = {}
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        for name, (query, args) in STATISTICS_QUERIES.items():
+            cursor.execute("EXPLAIN QUERY PLAN " + query, args)
+            lines = [row["detail"] for row in cursor.fetchall()]
+            plans[name] = (lines, [line for line in lines if line.startswith("SCAN")])
+    return plans
+
 def get_player_statistics_per_position(db_path, player_name, min_players=2, max_players=6):
     """Retrieves statistics grouped by position for the given players from the database."""
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
-        query = f"""
-        SELECT 
-        ph.position_name AS position,
-        COUNT(ph.hand_id) AS hands,
-        ROUND(CAST(SUM(ph.vpip) AS FLOAT) / CAST(SUM(ph.participed) AS FLOAT)*100,2) AS VPIP,
-        ROUND(CAST(SUM(ph.pfr) AS FLOAT) / CAST(SUM(ph.participed) AS FLOAT)*100,2) AS PFR,
-        ROUND(CAST(SUM(ph.aggressive) AS FLOAT) / CAST(SUM(ph.passive) AS FLOAT),2) AS AF,
-        ROUND(CAST(SUM(ph.two_bet) AS FLOAT) / CAST(SUM(ph.two_bet_possibility) AS FLOAT)*100,2) AS two_bet,
-        ROUND(CAST(SUM(ph.limp) AS FLOAT) / CAST(SUM(ph.two_bet_possibility) AS FLOAT)*100,2) AS limp,
-        ROUND(CAST(SUM(ph.three_bet) AS FLOAT) / CAST(SUM(ph.three_bet_possibility) AS FLOAT)*100,2) AS three_bet,
-        ROUND(AVG(profit) / h.big_blind_amount,2) AS bb_per_hand
-        FROM players_hands ph JOIN hands h ON h.id == ph.hand_id JOIN players p ON p.id == ph.player_id
-        WHERE p.name == "{player_name}" AND h.number_players >= {min_players} AND  h.number_players <= {max_players} 
-        GROUP BY position_name 
-        ORDER BY MAX(ph.position) DESC
-        """
-        cursor.execute(query)
+        cursor.execute(PLAYER_STATISTICS_PER_POSITION_QUERY, (player_name, min_players, max_players))
         player_stats = cursor.fetchall()
         return player_stats
 
@@ -292,25 +832,7 @@ def get_player_full_statistics(db_path, player_name, min_players=2, max_players=
     """Retrieves statistics grouped by position for the given players from the database."""
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
-        query = f"""
-        SELECT 
-        COUNT(ph.hand_id) AS hands,
-        ROUND(CAST(SUM(ph.vpip) AS FLOAT) / CAST(SUM(ph.participed) AS FLOAT)*100,2) AS VPIP,
-        ROUND(CAST(SUM(ph.pfr) AS FLOAT) / CAST(SUM(ph.participed) AS FLOAT)*100,2) AS PFR,
-        ROUND(CAST(SUM(ph.aggressive) AS FLOAT) / CAST(SUM(ph.passive) AS FLOAT),2) AS AF,
-        ROUND(CAST(SUM(ph.two_bet) AS FLOAT) / CAST(SUM(ph.two_bet_possibility) AS FLOAT)*100,2) AS two_bet,
-        ROUND(CAST(SUM(ph.limp) AS FLOAT) / CAST(SUM(ph.two_bet_possibility) AS FLOAT)*100,2) AS limp,
-        ROUND(CAST(SUM(ph.three_bet) AS FLOAT) / CAST(SUM(ph.three_bet_possibility) AS FLOAT)*100,2) AS three_bet,
-        ROUND(SUM(CASE WHEN profit > 0 THEN profit ELSE 0 END) + SUM(rake), 2) AS total_won,
-        ROUND(SUM(CASE WHEN profit < 0 THEN profit ELSE 0 END),2) AS total_lost,
-        ROUND(SUM(rake),2) AS total_rake,
-        ROUND(SUM(profit),2) AS profit,
-        ROUND(AVG(rake)/h.big_blind_amount*100,2) AS rake_bb_per_100hand,
-        ROUND(AVG(profit)/h.big_blind_amount,2) AS bb_per_hand
-        FROM players_hands ph JOIN hands h ON h.id == ph.hand_id JOIN players p ON p.id == ph.player_id
-        WHERE p.name == "{player_name}" AND h.number_players >= {min_players} AND  h.number_players <= {max_players} 
-        """
-        cursor.execute(query)
+        cursor.execute(PLAYER_FULL_STATISTICS_QUERY, (player_name, min_players, max_players))
         player_stats = cursor.fetchone()
 
         return player_stats
@@ -320,58 +842,134 @@ def get_player_full_statistics(db_path, player_name, min_players=2, max_players=
 def get_player_profit_historique(player_name, db_path):
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
-        query = """
-        SELECT h.date_time AS date_time,
-               ph.profit AS profit 
-        FROM players p
-        JOIN players_hands ph ON p.id = ph.player_id
-        JOIN hands h ON ph.hand_id = h.id
-        WHERE p.name == ?
-        """
-        cursor.execute(query, (player_name,))
+        cursor.execute(PLAYER_PROFIT_HISTORIQUE_QUERY, (player_name,))
         result = cursor.fetchall()
         return result
 
-def full_update_players_hands(db_path):
-    """Fully updates players_hands table by reparsing all hands. Use this if you update parse_hand_at_upload function with modified or new statistics. All players should already be in the players table."""
+def get_player_profit_buckets(player_name, db_path):
+    """Returns the cumulative profits of the player every PROFIT_BUCKET_SIZE hands, and at its last hand."""
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT id, ohh_data FROM hands")
-        hands = cursor.fetchall()
+        cursor.execute(PLAYER_PROFIT_BUCKETS_QUERY, (PROFIT_BUCKET_SIZE, player_name))
+        return cursor.fetchall()
 
-        cursor.execute("SELECT id, name FROM players")
-        players = cursor.fetchall()
+def get_player_profit_days(player_name, db_path):
+    """Returns the cumulative hands and profits of the player at the end of each day it played."""
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(PLAYER_PROFIT_DAYS_QUERY, (player_name,))
+        return cursor.fetchall()
 
-        # We can't update a table directly with df.to_sql() and by replacing it we loose the types information. For simplicity and generality we will remove the old table, recreate one empty with init_db and append to the table with to_sql().
+def get_range_statistics(player_name, db_path):
+    """Returns the preflop counts of the player for each position name, position index and hand class, in one pass on the players_hands_range index."""
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(RANGE_STATISTICS_QUERY, (player_name,))
+        return cursor.fetchall()
+
+PLAYERS_HANDS_SHADOW = "players_hands_rederived" # Written by full_update_players_hands, renamed to players_hands at the end
+
+def parse_stored_hands_chunk(hands, allin_ev_samples=None):
+    """Parses stored hands, [(id, ohh_data)], and returns [(hand id, players data)], skipping anonymous hands. This function is run by the re-derivation workers."""
+    parsed = []
+    for hand_id, ohh_data in hands:
+        hands_data, players_hands_data = parse_hand_at_upload(decode_ohh_data(ohh_data), allin_ev_samples)
+        if players_hands_data is not None:
+            parsed.append((hand_id, players_hands_data))
+    return parsed
+
+def insert_players_hands(cursor, table, parsed):
+    """Inserts the players data parsed by parse_stored_hands_chunk into table, creating the unknown players."""
+    name_to_id = resolve_player_ids(cursor, {name for hand_id, players_hands in parsed for name in players_hands})
+    cursor.executemany(PLAYERS_HANDS_INSERT_INTO.format(table=table), [
+        (name_to_id[name], hand_id, *(data[column] for column in PLAYERS_HANDS_COLUMNS))
+        for hand_id, players_hands in parsed
+        for name, data in players_hands.items()
+    ])
+
+def full_update_players_hands(db_path, chunk_size=1000, workers=None, max_pending_chunks=None, progress=None, pragmas=None, allin_ev_samples=None):
+    """Fully updates players_hands table by reparsing all hands. Use this if you update parse_hand_at_upload function with modified or new statistics.
+    Hands are read by chunks of chunk_size ids, parsed in a process pool and written into the shadow table PLAYERS_HANDS_SHADOW, one chunk per
+    transaction, so players_hands stays usable meanwhile. At the end, the hands imported in the meantime are parsed too and the shadow table
+    replaces players_hands in one transaction, with its indexes, the players statistics and the profit rollups.
+    The shadow table is created from PLAYERS_HANDS_TABLE, so a change of the columns is taken into account.
+    progress is an optional callable receiving the number of hands parsed so far and the number of hands.
+    allin_ev_samples is the number of samples of the all-in equities, see ALLIN_EV_SAMPLES.
+    Returns the number of parsed hands."""
+    workers = workers or os.cpu_count() or 1
+    max_pending_chunks = max_pending_chunks or 2 * workers
+
+    with sqlite3.connect(db_path) as conn, load_pragmas(conn, pragmas), ProcessPoolExecutor(max_workers=workers) as executor:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {PLAYERS_HANDS_SHADOW}") # Left by an interrupted update
+        cursor.execute(PLAYERS_HANDS_TABLE.format(table=PLAYERS_HANDS_SHADOW))
+        conn.commit()
+        cursor.execute("SELECT COUNT(*) FROM hands")
+        total = cursor.fetchone()[0]
+
+        parsed = 0
+        last_id = 0
+        pending = deque() # (number of hands, future) in id order
+
+        def read_chunk():
+            nonlocal last_id
+            cursor.execute("SELECT id, ohh_data FROM hands WHERE id > ? ORDER BY id LIMIT ?", (last_id, chunk_size))
+            hands = cursor.fetchall()
+            if hands:
+                last_id = hands[-1][0]
+            return hands
+
+        def write_oldest():
+            nonlocal parsed
+            count, future = pending.popleft()
+            insert_players_hands(cursor, PLAYERS_HANDS_SHADOW, future.result())
+            conn.commit()
+            parsed += count
+            if progress is not None:
+                progress(parsed, max(total, parsed))
+
+        for hands in iter(read_chunk, []):
+            pending.append((len(hands), executor.submit(parse_stored_hands_chunk, hands, allin_ev_samples)))
+            # Backpressure : wait for the writer before reading more hands
+            if len(pending) >= max_pending_chunks:
+                write_oldest()
+        while pending:
+            write_oldest()
+
+        # The write lock is held until the swap is committed : no hand can be imported between the last chunk and the swap
+        cursor.execute("BEGIN IMMEDIATE")
+        for hands in iter(read_chunk, []):
+            insert_players_hands(cursor, PLAYERS_HANDS_SHADOW, parse_stored_hands_chunk(hands, allin_ev_samples))
+            parsed += len(hands)
         cursor.execute("DROP TABLE players_hands")
-
+        cursor.execute(f"ALTER TABLE {PLAYERS_HANDS_SHADOW} RENAME TO players_hands")
+        for index in PLAYERS_HANDS_INDEXES:
+            cursor.execute(index)
+        rebuild_players_statistics(cursor)
+        rebuild_players_profit_rollups(cursor)
         conn.commit()
 
-    init_db(db_path) # Recreates players_hands table
-
-    name_to_id = {player["name"]:player["id"] for player in players}
-    
-    players_hands_df_list = []
-    for hand in hands:
-        ohh = json.loads(hand["ohh_data"])
-        hands_data, players_hands_data = parse_hand_at_upload(ohh)
-        df = pd.DataFrame(data = players_hands_data).T.reset_index(names = 'player_id')
-        df['player_id'] = df['player_id'].apply(lambda name : name_to_id[name])
-        df["hand_id"] = hand["id"]
-        players_hands_df_list.append(df)
-
-    players_hands_df = pd.concat(players_hands_df_list, ignore_index=True)
-
-    with sqlite3.connect(db_path) as conn:
-
-        players_hands_df.to_sql(
-            name = 'players_hands',# Name of SQL table.
-            con = conn, # sqlalchemy.engine.Engine or sqlite3.Connection
-            if_exists='append', # How to behave if the table already exists. You can use 'replace', 'append' to replace it.
-            index=False, # It means index of DataFrame will save. Set False to ignore the index of DataFrame.
-            chunksize= 999 // (len(players_hands_df.columns)+1), # If DataFrame is big, this parameter is needed 
-            method="multi", # For inserting with executemany
-            dtype=None, # Set the columns type of sql table. Usefull when creating the table
-        )
-        conn.commit()
-    
+    if progress is not None:
+        progress(parsed, parsed)
+    return parsed
+
+def convert_ohh_data(db_path, compress=True, chunk_size=1000, progress=None):
+    """Rewrites the ohh_data of every hand in the given storage format (see encode_ohh_data), one chunk of hands per transaction.
+    Run VACUUM afterwards to give the freed space back to the file system. Returns the number of converted hands."""
+    converted = 0
+    last_id = 0
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        while True:
+            cursor.execute("SELECT id, ohh_data FROM hands WHERE id > ? ORDER BY id LIMIT ?", (last_id, chunk_size))
+            hands = cursor.fetchall()
+            if not hands:
+                break
+            cursor.executemany("UPDATE hands SET ohh_data = ? WHERE id = ?",
+                               [(encode_ohh_data(decode_ohh_data(hand["ohh_data"]), compress), hand["id"]) for hand in hands])
+            conn.commit()
+            converted += len(hands)
+            last_id = hands[-1]["id"]
+            if progress is not None:
+                progress(converted)
+    return converted
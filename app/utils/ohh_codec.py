@@ -0,0 +1,43 @@
+import json
+import zlib
+
+# Compressed ohh_data blobs start with this prefix. The digit is the version of the dictionary, a dictionary must
+# never be modified once blobs were written with it : add a new one with a new prefix instead.
+ZLIB_PREFIX_V1 = b"Z1"
+
+# Shared zlib dictionary with the strings found in every OHH hand. A single hand is too small for zlib to learn them,
+# priming the compressor with them is what makes per-hand compression worthwhile. Most common strings go last.
+OHH_ZDICT_V1 = (
+    '"network_name":"","internal_version":"","tournament":false,"currency":"USD","table_handle":"",'
+    '"bet_limit":{"bet_type":"NL","bet_cap":0},"game_type":"Holdem","ante_amount":0,"jackpot":0,'
+    '"cashout_fee":0,"cashout_amount":0,"bonus_amount":0,"is_allin":true,"is_allin":false,'
+    '"action":"Straddle","action":"Post Ante","action":"Post Extra Blind","action":"Mucks Cards",'
+    '"action":"Shows Cards","street":"Showdown","street":"River","street":"Turn","street":"Flop",'
+    '{"ohh":{"spec_version":"1.4.6","site_name":"","game_number":"","start_date_utc":"","table_name":"",'
+    '"table_size":6,"hero_player_id":0,"dealer_seat":1,"small_blind_amount":0.5,"big_blind_amount":1,"flags":[],'
+    '"players":[{"id":0,"seat":1,"name":"","display":"","starting_stack":100,"final_stack":100},'
+    '"pots":[{"number":0,"amount":0,"rake":0,"player_wins":[{"player_id":0,"win_amount":0,"contributed_rake":0}]}]}}'
+    '"rounds":[{"id":0,"street":"Preflop","cards":[],"actions":[{"action_number":0,"player_id":0,"action":"Dealt Cards",'
+    '"cards":["As","Kd"]},{"action_number":1,"player_id":1,"action":"Post SB","amount":0.5},'
+    '{"action_number":2,"player_id":2,"action":"Post BB","amount":1},{"action_number":3,"player_id":3,"action":"Raise",'
+    '"amount":'
+    '{"action_number":4,"player_id":4,"action":"Call","amount":{"action_number":5,"player_id":5,"action":"Bet","amount":'
+    '{"action_number":6,"player_id":0,"action":"Check"},{"action_number":7,"player_id":1,"action":"Fold"},'
+).encode()
+
+
+def encode_ohh_data(hand_data, compress=True):
+    """Serializes an OHH hand for the hands.ohh_data column : compact JSON compressed with the shared dictionary, or JSON text."""
+    if not compress:
+        return json.dumps(hand_data)
+    compressor = zlib.compressobj(level=9, zdict=OHH_ZDICT_V1)
+    text = json.dumps(hand_data, separators=(",", ":"))
+    return ZLIB_PREFIX_V1 + compressor.compress(text.encode()) + compressor.flush()
+
+
+def decode_ohh_data(value):
+    """Returns the OHH hand stored in hands.ohh_data, whatever the format it was stored with."""
+    if isinstance(value, bytes) and value.startswith(ZLIB_PREFIX_V1):
+        decompressor = zlib.decompressobj(zdict=OHH_ZDICT_V1)
+        value = decompressor.decompress(value[len(ZLIB_PREFIX_V1):]) + decompressor.flush()
+    return json.loads(value)
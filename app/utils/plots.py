@@ -1,25 +1,22 @@
 from app.utils.models import * 
-import pandas as pd
 from io import BytesIO
 from matplotlib.figure import Figure
 import numpy as np
 import seaborn as sns
 from app.utils.poker_utils import cardsToClass
+from app.utils.charts import hand_structure, get_profit_series
 
 
 def generate_cummulative_profit_plot(player_name, db_path, window_size = 10):
-    player_profits = get_player_profit_historique(player_name, db_path)
-    profits_df =  pd.DataFrame(player_profits)
-    profits_df["date_time"] =  pd.to_datetime(profits_df['date_time'], format='%Y-%m-%d %H:%M:%S')
-    profits_df.sort_values(by='date_time', inplace=True, ignore_index=True)
-    profits_df["profit_cum"] = np.cumsum(profits_df["profit"])
-    profits_df["profit_cum_smooth"] = profits_df["profit_cum"].rolling(window=window_size).mean()
-    
+    # Same series as the chart of the statistics page, read from the profit rollups for the players with many hands
+    profits = get_profit_series(player_name, db_path, window_size, points = 1200)
+
     # Generate the plot
     fig = Figure(figsize=(12, 6))
     ax = fig.subplots()
-    #ax.plot(profits_df["profit_cum"])
-    ax.plot(profits_df["profit_cum_smooth"])
+    for name, series in profits["series"].items():
+        ax.plot(series["x"], series["y"], label=name)
+    ax.legend()
     ax.set_title(f"Statistics for {player_name}")
     ax.set_xlabel("Hands")
     ax.set_ylabel("Cumulative profit (€)")
@@ -32,44 +29,15 @@ def generate_cummulative_profit_plot(player_name, db_path, window_size = 10):
 
 
 # Returns a dictionnary of the type hand_class : probability
+# position is the index of players_hands.position, as before the range grids were grouped by position name (see charts.get_range_grids)
 def get_hand_class_stats(player_name, db_path, position = None):
-    hands = []
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM players WHERE name == ?", (player_name,))
-        player_id = cursor.fetchone()[0]
-        
-        data = pd.read_sql(f"SELECT hand_class, position, vpip, pfr, limp, two_bet, h.number_players FROM players_hands JOIN hands h ON h.id == hand_id WHERE player_id == {player_id} AND hand_class IS NOT NULL ",conn)    
-
-        if position :
-            data = data[data["position"] == position]
-
-        # Calculating the required metrics
-        result = data.groupby("hand_class").agg(
-            hand_class_count=("hand_class", "size"),  # Count the occurrences of each hand_class
-            vpip_count=("vpip", "sum"),  # Sum vpip for each hand_class
-            two_bet_count=("two_bet", "sum"),
-            limp_count=("limp", "sum")
-        ).reset_index()
-        result["pourcentage_vpip"] = result["vpip_count"] / result["hand_class_count"]
-
-        return dict(zip(result['hand_class'], result['pourcentage_vpip']))
-
-hand_structure = [
-    ['AA', 'AKs', 'AQs', 'AJs', 'ATs', 'A9s', 'A8s', 'A7s', 'A6s', 'A5s', 'A4s', 'A3s', 'A2s'],
-    ['AKo', 'KK', 'KQs', 'KJs', 'KTs', 'K9s', 'K8s', 'K7s', 'K6s', 'K5s', 'K4s', 'K3s', 'K2s'],
-    ['AQo', 'KQo', 'QQ', 'QJs', 'QTs', 'Q9s', 'Q8s', 'Q7s', 'Q6s', 'Q5s', 'Q4s', 'Q3s', 'Q2s'],
-    ['AJo', 'KJo', 'QJo', 'JJ', 'JTs', 'J9s', 'J8s', 'J7s', 'J6s', 'J5s', 'J4s', 'J3s', 'J2s'],
-    ['ATo', 'KTo', 'QTo', 'JTo', 'TT', 'T9s', 'T8s', 'T7s', 'T6s', 'T5s', 'T4s', 'T3s', 'T2s'],
-    ['A9o', 'K9o', 'Q9o', 'J9o', 'T9o', '99', '98s', '97s', '96s', '95s', '94s', '93s', '92s'],
-    ['A8o', 'K8o', 'Q8o', 'J8o', 'T8o', '98o', '88', '87s', '86s', '85s', '84s', '83s', '82s'],
-    ['A7o', 'K7o', 'Q7o', 'J7o', 'T7o', '97o', '87o', '77', '76s', '75s', '74s', '73s', '72s'],
-    ['A6o', 'K6o', 'Q6o', 'J6o', 'T6o', '96o', '86o', '76o', '66', '65s', '64s', '63s', '62s'],
-    ['A5o', 'K5o', 'Q5o', 'J5o', 'T5o', '95o', '85o', '75o', '65o', '55', '54s', '53s', '52s'],
-    ['A4o', 'K4o', 'Q4o', 'J4o', 'T4o', '94o', '84o', '74o', '64o', '54o', '44', '43s', '42s'],
-    ['A3o', 'K3o', 'Q3o', 'J3o', 'T3o', '93o', '83o', '73o', '63o', '53o', '43o', '33', '32s'],
-    ['A2o', 'K2o', 'Q2o', 'J2o', 'T2o', '92o', '82o', '72o', '62o', '52o', '42o', '32o', '22']
-]
+    counts = {}
+    for row in get_range_statistics(player_name, db_path):
+        if position and row["position"] != position: # No position (or 0) means all of them, like the previous pandas filter
+            continue
+        hands, vpip = counts.get(row["hand_class"], (0, 0))
+        counts[row["hand_class"]] = (hands + row["hands"], vpip + (row["vpip"] or 0))
+    return {hand_class: vpip / hands for hand_class, (hands, vpip) in counts.items()}
 
 def generate_opening_range_plot(player_name, db_path, position = None):
     print("entered generate_opening_range_plot")
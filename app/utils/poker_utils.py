@@ -2,6 +2,7 @@ from phevaluator import evaluate_cards
 from typing import List, Dict, Tuple
 from app.poker.card import Card
 from app.poker.player import Player
+from app.utils.hand_evaluator import card_to_int, cards_to_array, evaluate_hands
 
 def get_hand_name(score: int) -> str:
     if score > 6185:
@@ -27,22 +28,18 @@ def get_hand_name(score: int) -> str:
 
 
 def evaluate_hand(hole_cards: List[Card], board_cards: List[Card]) -> Tuple[int, str]:
-    all_cards = [str(card) for card in hole_cards + board_cards]
+    all_cards = [card_to_int(card) for card in hole_cards + board_cards]
     hand_rank = evaluate_cards(*all_cards)
     hand_name = get_hand_name(hand_rank)
     return hand_rank, hand_name
 
 def find_winners(players_cards: Dict[Player, List[Card]], board_cards: List[Card]) -> List[Tuple[Player, str]]:
-    best_rank = 6185
-    winners = []
-    for player, hole_cards in players_cards.items():
-        hand_rank, hand_rank_str = evaluate_hand(hole_cards, board_cards)
-        if hand_rank < best_rank:
-            best_rank = hand_rank
-            winners = [(player, hand_rank_str)]
-        elif hand_rank == best_rank:
-            winners.append((player, hand_rank_str))
-    return winners
+    players = list(players_cards)
+    hands = cards_to_array([players_cards[player] + board_cards for player in players])
+    hand_ranks = evaluate_hands(hands)
+    best_rank = hand_ranks.min()
+    hand_name = get_hand_name(int(best_rank))
+    return [(player, hand_name) for player, hand_rank in zip(players, hand_ranks) if hand_rank == best_rank]
 
 def cardsListToString(cards):
     return " ".join([getCardSymbol(card) for card in cards])
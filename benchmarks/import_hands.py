@@ -0,0 +1,152 @@
+"""Import throughput benchmark.
+
+Compares the pandas to_sql loader previously used by save_hands_bulk with the executemany bulk loader,
+on synthetic 6-max hands. Run from the repository root :
+
+    python -m benchmarks.import_hands --hands 20000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import pandas as pd
+from app.utils.models import init_db, parse_hands_chunk, insert_parsed_hands, apply_pragmas, LOAD_PRAGMAS
+
+RANKS = "23456789TJQKA"
+SUITS = "cdhs"
+
+
+def make_hand(number, rng, table_size=6):
+    """Returns a random but valid OHH hand : blinds, an open raise, calls or folds and a c-bet on the flop."""
+    deck = [rank + suit for rank in RANKS for suit in SUITS]
+    rng.shuffle(deck)
+    players = [{"id": i, "name": f"Player{rng.randrange(200)}_{i}", "seat": i + 1, "starting_stack": 100.0}
+               for i in range(table_size)]
+    dealer = rng.randrange(table_size)
+    order = [(dealer + 1 + i) % table_size for i in range(table_size)] # From SB to BU
+    bets = dict.fromkeys(range(table_size), 0.0)
+
+    actions = [{"action_number": i, "player_id": p, "action": "Dealt Cards", "cards": [deck.pop(), deck.pop()]}
+               for i, p in enumerate(order)]
+    def act(player_id, action, amount=0.0):
+        actions.append({"action_number": len(actions), "player_id": player_id, "action": action, "amount": amount})
+        bets[player_id] += amount
+
+    act(order[0], "Post SB", 0.5)
+    act(order[1], "Post BB", 1.0)
+    raiser = order[2]
+    act(raiser, "Raise", 3.0)
+    callers = []
+    for p in order[3:] + order[:2]:
+        if rng.random() < 0.3:
+            act(p, "Call", 3.0 - bets[p])
+            callers.append(p)
+        else:
+            act(p, "Fold")
+
+    rounds = [{"id": 0, "street": "Preflop", "actions": actions}]
+    if callers:
+        actions = []
+        act(raiser, "Bet", 4.0)
+        for p in callers:
+            act(p, "Fold")
+        rounds.append({"id": 1, "street": "Flop", "cards": [deck.pop() for _ in range(3)], "actions": actions})
+
+    pot = sum(bets.values())
+    for player in players:
+        player["final_stack"] = player["starting_stack"] - bets[player["id"]] + (pot if player["id"] == raiser else 0)
+
+    return {"ohh": {
+        "spec_version": "1.4.6",
+        "site_name": "Benchmark",
+        "game_number": str(number),
+        "start_date_utc": f"2024-01-{1 + number % 28:02d}T{number % 24:02d}:{number % 60:02d}:00Z",
+        "table_name": f"Table {number % 10}",
+        "table_size": table_size,
+        "hero_player_id": 0,
+        "dealer_seat": dealer + 1,
+        "small_blind_amount": 0.5,
+        "big_blind_amount": 1.0,
+        "flags": [],
+        "players": players,
+        "rounds": rounds,
+        "pots": [{"number": 0, "amount": pot, "rake": 0,
+                  "player_wins": [{"player_id": raiser, "win_amount": pot, "contributed_rake": 0}]}],
+    }}
+
+
+def insert_with_pandas(conn, hands_dics, players_hands_dics):
+    """The loader used before the executemany bulk loader, kept here as the baseline."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(id) FROM hands")
+    max_id = cursor.fetchone()[0] or 0
+    hands_df = pd.DataFrame.from_dict(hands_dics)
+    hands_df.to_sql(name='hands', con=conn, if_exists='append', index=False,
+                    chunksize=999 // (len(hands_df.columns) + 1), method="multi")
+    hand_ids = range(max_id + 1, max_id + 1 + len(hands_dics))
+
+    name_to_id = {}
+    for name in {name for players_hands in players_hands_dics for name in players_hands}:
+        cursor.execute("SELECT id FROM players WHERE name = ?", (name,))
+        result = cursor.fetchone()
+        if result:
+            name_to_id[name] = result[0]
+        else:
+            cursor.execute("INSERT INTO players (name) VALUES (?)", (name,))
+            name_to_id[name] = cursor.lastrowid
+
+    players_hands_df_list = []
+    for hand_id, players_hands in zip(hand_ids, players_hands_dics):
+        df = pd.DataFrame(data=players_hands).T.reset_index(names='player_id')
+        df['player_id'] = df['player_id'].apply(lambda name: name_to_id[name])
+        df["hand_id"] = hand_id
+        players_hands_df_list.append(df)
+    players_hands_df = pd.concat(players_hands_df_list, ignore_index=True)
+    players_hands_df.to_sql(name='players_hands', con=conn, if_exists='append', index=False,
+                            chunksize=999 // (len(players_hands_df.columns) + 1), method="multi")
+
+
+def run(loader, parsed_chunks, pragmas):
+    """Loads the parsed chunks in a fresh database and returns the elapsed time."""
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "benchmark.db")
+        init_db(db_path)
+        with sqlite3.connect(db_path) as conn:
+            apply_pragmas(conn, pragmas)
+            start = time.perf_counter()
+            for hands_dics, players_hands_dics in parsed_chunks:
+                loader(conn, hands_dics, players_hands_dics)
+                conn.commit()
+            elapsed = time.perf_counter() - start
+        conn.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hands", type=int, default=10000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    hands = [make_hand(number, rng) for number in range(args.hands)]
+
+    start = time.perf_counter()
+    parsed_chunks = [parse_hands_chunk(hands[i:i + args.chunk_size]) for i in range(0, len(hands), args.chunk_size)]
+    parsing = time.perf_counter() - start
+    print(f"{'parse_hands_chunk':<40} {args.hands / parsing:>10.0f} hands/s")
+
+    for name, loader, pragmas in [
+        ("pandas to_sql (before)", insert_with_pandas, None),
+        ("executemany", insert_parsed_hands, None),
+        ("executemany + LOAD_PRAGMAS", insert_parsed_hands, LOAD_PRAGMAS),
+    ]:
+        elapsed = run(loader, parsed_chunks, pragmas)
+        print(f"{name:<40} {args.hands / elapsed:>10.0f} hands/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Side pots benchmark.
+
+Times Table.set_winnings against the original implementation, which rescanned every player for each bet level and
+called find_winners for each side pot, on random multiway all-ins. tests/test_side_pots.py checks that both give the
+same results. Run from the repository root :
+
+    python -m benchmarks.side_pots --scenarios 20000
+"""
+import argparse
+import copy
+import random
+import time
+from decimal import Decimal
+from app.poker import Deck, Hand, Player, Pot
+from app.poker.table import Table, SeatRing
+from app.utils.hand_evaluator import get_tables
+from app.utils.poker_utils import find_winners
+
+
+def set_winnings_original(table):
+    """set_winnings of the original table engine, before the single pass side pots builder and the integer chips.
+    Only the chips of the players still in the hand go to the pots, and split pots are divided, so it is only defined
+    for Decimal chips."""
+    # Calculate total bets for each player (starting_stack - current_stack)
+    total_bets = {
+        player: player.starting_stack - player.stack
+        for player in table.active_players
+    }
+    # Sort by bet amount in ascending order
+    sorted_bets = dict(sorted(total_bets.items(), key=lambda x: x[1]))
+
+    # Create pots based on bet levels
+    current_pot_number = 1
+    previous_bet_level = Decimal('0.00')
+
+    for player, bet_amount in sorted_bets.items():
+        if bet_amount > previous_bet_level:
+            # Create new pot for this bet level
+            pot_amount = Decimal('0.00')
+            eligible_players = []
+
+            # Calculate pot size and eligible players
+            for p, total_bet in sorted_bets.items():
+                if total_bet >= bet_amount:
+                    pot_amount += bet_amount - previous_bet_level
+                    eligible_players.append(p)
+
+            if pot_amount > Decimal('0.00'):
+                pot = Pot(
+                    pot_number=current_pot_number,
+                    amount=pot_amount
+                )
+
+                if len(eligible_players) == 1:
+                    # Only one eligible player, they win this pot
+                    winner = eligible_players[0]
+                    winner.mucks = False
+                    winner.stack += pot_amount
+                    winner.add_winnings(win_amount=pot_amount)
+                    pot.add_player(winner)
+                    table.logs.append(f"{winner.name} won {pot_amount/table.big_blind} BB")
+                else:
+                    # Find winners among eligible players
+                    eligible_hands = {
+                        p: p.cards for p in eligible_players
+                    }
+                    winners_hands = find_winners(eligible_hands, table.board_cards)
+                    portion = pot_amount / len(winners_hands)
+
+                    for winner, hand_name in winners_hands:
+                        winner.mucks = False
+                        winner.stack += portion
+                        winner.add_winnings(win_amount=portion)
+                        pot.add_player(winner)
+                        table.logs.append(f"{winner.name} won {portion/table.big_blind} BB with {hand_name}")
+
+                table.current_hand.add_pot(pot)
+                current_pot_number += 1
+
+            previous_bet_level = bet_amount
+
+
+def make_showdown(rng, minor_units=None, folds=False, table_size=9):
+    """Returns a table at the end of a random hand : 2 to table_size players, each all-in or calling a random level,
+    with a full board. With folds, some players fold after putting chips in the pot."""
+    table = Table(0, "Side pots", Decimal("0.5"), Decimal("1"), table_size, minor_units=minor_units)
+    table.verbose = False
+    deck = Deck()
+    seats = sorted(rng.sample(range(table_size), rng.randint(2, table_size)))
+    levels = sorted(table.to_chips(Decimal(rng.randint(1, 200))) for _ in range(rng.randint(1, 4)))
+    for seat in seats:
+        stack = table.to_chips(Decimal(rng.randint(1, 200)))
+        player = Player(seat, f"Player{seat}", seat, stack, zero=table.zero)
+        player.cards = deck.draw(2)
+        contribution = min(stack, rng.choice(levels))
+        player.starting_stack, player.stack = stack, stack - contribution
+        table.players[player.id] = player
+    table.hand_players = list(table.players.values())
+    table.active_players = SeatRing(table_size)
+    in_hand = table.hand_players if not folds else rng.sample(table.hand_players, rng.randint(1, len(table.hand_players)))
+    for player in in_hand:
+        table.active_players.append(player.seat, player)
+    table.board_cards = deck.draw(5)
+    table.dealer_seat = rng.choice(seats)
+    table.current_hand = Hand()
+    return table
+
+
+def result(table):
+    return ([(player.name, player.stack) for player in table.players.values()],
+            [(pot.amount, [player.name for player in pot.players]) for pot in table.current_hand.pots])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    get_tables()
+
+    # The original implementation only handles Decimal chips
+    runs = [("Decimal chips", None, set_winnings_original), ("Integer chips (100)", 100, None)]
+    for name, minor_units, original in runs:
+        tables = [make_showdown(rng, minor_units) for _ in range(args.scenarios)]
+        originals = copy.deepcopy(tables)
+
+        start = time.perf_counter()
+        for table in tables:
+            table.set_winnings()
+        elapsed = time.perf_counter() - start
+        line = f"{name:<22} {elapsed / args.scenarios * 1e6:.1f} us per set_winnings"
+        if original is not None:
+            start = time.perf_counter()
+            for table in originals:
+                original(table)
+            original_elapsed = time.perf_counter() - start
+            line += f" (original : {original_elapsed / args.scenarios * 1e6:.1f} us)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
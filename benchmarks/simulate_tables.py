@@ -0,0 +1,221 @@
+"""Headless table simulator.
+
+Runs many Table instances driven by random bots, without the web layer, to measure how many tables a node can host
+and to catch throughput regressions in Table.action, next_round and set_winnings. Tables are spread over a process
+pool and their actions are interleaved inside each worker, like concurrent tables sharing a server process.
+Run from the repository root :
+
+    python -m benchmarks.simulate_tables --tables 200 --hands 50 --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+import numpy as np
+from app.poker.table.table import Table
+from app.utils.hand_evaluator import get_tables
+
+SMALL_BLIND = Decimal("0.5")
+BIG_BLIND = Decimal("1")
+STARTING_STACK = Decimal(100)
+
+
+def make_table(table_id, players=6, minor_units=None):
+    table = Table(table_id, f"Table {table_id}", SMALL_BLIND, BIG_BLIND, players, minor_units=minor_units)
+    table.verbose = False
+    for i in range(players):
+        table.new_player(i, f"Bot{i}", table.to_chips(STARTING_STACK))
+    return table
+
+
+def random_action(table, rng):
+    """Returns a random legal (action_type, amount) for the player whose turn it is."""
+    player = table.get_current_player()
+    to_call = table.current_bet - player.bet_amount
+    can_raise = player.stack >= to_call + table.small_blind # Table refuses all-in raises smaller than the minimum raise
+    roll = rng.random()
+    if to_call == 0:
+        if roll < 0.7:
+            return "Check", Decimal("0.00")
+        if table.current_bet == 0:
+            return "Bet", table.big_blind * rng.randint(1, 10)
+        if can_raise:
+            return "Raise", table.big_blind * rng.randint(1, 10) # Big blind option preflop
+        return "Check", Decimal("0.00")
+    if roll < 0.3:
+        return "Fold", Decimal("0.00")
+    if roll < 0.85 or not can_raise:
+        return "Call", Decimal("0.00")
+    return "Raise", to_call + table.big_blind * rng.randint(1, 20)
+
+
+def play_action(table, rng):
+    """Plays a random action and returns its type and latency in ns. Table raises an Exception, before changing its state,
+    for the few spots random_action gets wrong : the bot then calls, or folds. Returns the number of refused actions too."""
+    refused = 0
+    action_type, amount = random_action(table, rng)
+    for action_type, amount in [(action_type, amount), ("Call", Decimal("0.00")), ("Fold", Decimal("0.00"))]:
+        before = time.perf_counter_ns()
+        try:
+            table.action(action_type, amount)
+        except Exception:
+            refused += 1
+            continue
+        return action_type, time.perf_counter_ns() - before, refused
+    raise RuntimeError("Table refused to fold")
+
+
+def start_hand(table):
+    """Rebuys busted bots and starts a new hand. Returns the chips on the table."""
+    for player in table.players.values():
+        if player.stack < table.big_blind:
+            player.add_chips(table.to_chips(STARTING_STACK) - player.stack)
+            player.status = "Active"
+    table.start_new_game()
+    return sum(player.stack for player in table.players.values()) + table.pot
+
+
+def simulate(tables, hands, players, seed, minor_units=None, barrier=None):
+    """Plays hands hands on each of tables tables, one action per table in turn. Run by the pool workers.
+    The workers wait on barrier once their tables are built, so they all start playing together.
+    Returns the number of hands, the elapsed time, the latency in ns of each action by action type, the number
+    of hands where the chips on the table changed, the number of actions refused by Table, and the wall clock
+    times at which the worker started and stopped playing."""
+    rng = random.Random(seed)
+    random.seed(seed) # Used by Deck and Table
+    get_tables() # Built once per process, not part of the measure
+    simulated = [make_table(table_id, players, minor_units) for table_id in range(tables)]
+    latencies = defaultdict(list)
+    played = [0] * tables
+    chips = [start_hand(table) for table in simulated]
+    chip_errors = 0
+    refused_actions = 0
+    running = list(range(tables))
+
+    if barrier is not None:
+        barrier.wait()
+    started = time.time()
+    start = time.perf_counter()
+    while running:
+        still_running = []
+        for index in running:
+            table = simulated[index]
+            action_type, latency, refused = play_action(table, rng)
+            latencies[action_type].append(latency)
+            refused_actions += refused
+
+            if table.current_hand is None: # The hand is over
+                played[index] += 1
+                if sum(player.stack for player in table.players.values()) != chips[index]:
+                    chip_errors += 1
+                if played[index] == hands:
+                    continue
+                chips[index] = start_hand(table)
+            still_running.append(index)
+        running = still_running
+    elapsed = time.perf_counter() - start
+
+    return (sum(played), elapsed, {name: np.array(values) for name, values in latencies.items()}, chip_errors, refused_actions,
+            started, time.time())
+
+
+def memory_per_table(tables, players, seed, minor_units=None):
+    """Returns the memory allocated per table, measured on tables that played one hand."""
+    random.seed(seed)
+    rng = random.Random(seed)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    simulated = [make_table(table_id, players, minor_units) for table_id in range(tables)]
+    for table in simulated:
+        start_hand(table)
+        while table.current_hand is not None:
+            play_action(table, rng)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / tables
+
+
+def compare_chip_modes(hands, players, minor_units, seed):
+    """Plays the same hands on a table with Decimal chips and on a table with integer chips. Every hand starts with
+    the starting stacks, so a difference doesn't change the next hands. Returns the number of hands after which both
+    tables have exactly the same stacks, in currency, and the largest stack difference in chips. Hands can only differ
+    by the odd chips of split pots, that Decimal chips divide : tests/test_chip_modes.py asserts it."""
+    get_tables()
+    histories = []
+    for units in (None, minor_units):
+        random.seed(seed)
+        rng = random.Random(seed)
+        table = make_table(0, players, units)
+        history = []
+        for _ in range(hands):
+            for player in table.players.values():
+                player.stack = table.to_chips(STARTING_STACK)
+                player.status = "Active"
+            start_hand(table)
+            while table.current_hand is not None:
+                play_action(table, rng)
+            history.append([table.from_chips(player.stack) for player in table.players.values()])
+        histories.append(history)
+    same = sum(decimal_stacks == integer_stacks for decimal_stacks, integer_stacks in zip(*histories))
+    difference = max(abs(decimal_stack - integer_stack) for decimal_stacks, integer_stacks in zip(*histories)
+                     for decimal_stack, integer_stack in zip(decimal_stacks, integer_stacks))
+    return same, difference * minor_units
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=100, help="Tables in total, split over the workers")
+    parser.add_argument("--hands", type=int, default=50, help="Hands played on each table")
+    parser.add_argument("--players", type=int, default=6)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--minor-units", type=int, default=None,
+                        help="Integer chips counting 1/minor_units of the currency (100 for cents), Decimal chips by default")
+    parser.add_argument("--compare-hands", type=int, default=0,
+                        help="Also checks that Decimal and integer chips give the same stacks on this number of hands")
+    args = parser.parse_args()
+
+    tables_per_worker = [len(part) for part in np.array_split(range(args.tables), args.workers) if len(part)]
+    workers = len(tables_per_worker)
+    # The throughput is measured from the barrier the workers wait on once their tables are built, so the start of the
+    # pool, get_tables and the construction of the tables are not part of it
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=workers) as executor:
+        barrier = manager.Barrier(workers)
+        results = list(executor.map(simulate, tables_per_worker, [args.hands] * workers, [args.players] * workers,
+                                    [args.seed + i for i in range(workers)], [args.minor_units] * workers,
+                                    [barrier] * workers))
+    wall = max(result[6] for result in results) - min(result[5] for result in results)
+
+    hands = sum(result[0] for result in results)
+    latencies = defaultdict(list)
+    for result in results:
+        for name, values in result[2].items():
+            latencies[name].append(values)
+    latencies = {name: np.concatenate(values) for name, values in latencies.items()}
+    latencies["All actions"] = np.concatenate(list(latencies.values()))
+
+    print(f"{hands} hands on {args.tables} tables ({args.players} players) with {workers} workers")
+    print(f"{'Throughput':<20} {hands / wall:>10.0f} hands/s ({sum(result[0] / result[1] for result in results):.0f} hands/s summed over the workers)")
+    print(f"{'Memory per table':<20} {memory_per_table(min(args.tables, 100), args.players, args.seed, args.minor_units) / 1024:>10.1f} KiB")
+    # Decimal chips divide split pots to 28 significant digits, a pot split in 3 doesn't add back up exactly. Integer
+    # chips give the odd chips to the first winners instead, they must not have any error
+    print(f"{'Chip errors':<20} {sum(result[3] for result in results):>10} hands"
+          f"{'' if args.minor_units else ' (rounding of the pots split by Decimal chips)'}")
+    print(f"{'Refused actions':<20} {sum(result[4] for result in results):>10}")
+    if args.compare_hands:
+        same, difference = compare_chip_modes(args.compare_hands, args.players, args.minor_units or 100, args.seed)
+        print(f"{'Same stacks':<20} {same:>10} / {args.compare_hands} hands (Decimal and integer chips, "
+              f"largest difference {difference:.2f} chips, the odd chips of split pots)")
+    print(f"\n{'Latency (us)':<20} {'count':>10} {'p50':>8} {'p90':>8} {'p99':>8} {'p99.9':>8} {'max':>8}")
+    for name, values in sorted(latencies.items(), key=lambda item: -len(item[1])):
+        p50, p90, p99, p999 = np.percentile(values, [50, 90, 99, 99.9]) / 1000
+        print(f"{name:<20} {len(values):>10} {p50:>8.1f} {p90:>8.1f} {p99:>8.1f} {p999:>8.1f} {values.max() / 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
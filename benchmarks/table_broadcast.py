@@ -0,0 +1,124 @@
+"""Table broadcast benchmark.
+
+Plays random hands on a full table and measures, per action, the time spent building the WebSocket messages of all
+the players and the bytes sent, for the previous broadcast that rendered the whole table for every player and for the
+fragment updates of rooms.broadcast. Then measures the time a broadcast takes for the acting player when one client
+is slow, with synchronous sends and with the queues of rooms.connections. Run from the repository root :
+
+    python -m benchmarks.table_broadcast --players 9 --hands 50 --slow-delay 0.05
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+from math import sin, cos, acos
+from flask import Flask, render_template
+from app.rooms.broadcast import get_table_update
+from app.rooms.connections import Connection
+from app.utils.hand_evaluator import get_tables
+from .simulate_tables import make_table, play_action, start_hand
+
+
+def full_table_messages(table):
+    """The broadcast before rooms.broadcast : the whole table rendered for every player."""
+    messages = []
+    for player_id in table.players:
+        general_data, gamestate = table.get_display_data(player_id)
+        messages.append(render_template("poker_table_obb.html", general_data=general_data, gamestate=gamestate))
+    return messages
+
+
+def fragment_messages(table, clients):
+    general_data, gamestate = table.get_public_display_data()
+    rendered = {}
+    messages = []
+    for player_id in table.players:
+        replace, parts = get_table_update(table, general_data, gamestate, player_id, clients[player_id], rendered)
+        if parts:
+            messages.append("\n".join(html for key, html, append in parts))
+    return messages
+
+
+class FakeSocket:
+    """Counts the messages sent to a client taking delay seconds to receive each of them."""
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.messages = 0
+
+    def send(self, message):
+        time.sleep(self.delay)
+        self.messages += 1
+
+
+def fan_out_latency(players, updates, delay):
+    """Sends updates updates of the 5 fragments of a table to players clients, one of them slow. Returns the time per
+    update spent by the broadcasting request with synchronous sends and with queued sends, and the messages the slow
+    client received with the queues."""
+    parts = [(f"fragment-{i}", "x" * 500, False) for i in range(5)]
+
+    sockets = [FakeSocket(delay)] + [FakeSocket() for _ in range(players - 1)]
+    start = time.perf_counter()
+    for _ in range(updates):
+        for sock in sockets:
+            sock.send("\n".join(html for key, html, append in parts))
+    synchronous = (time.perf_counter() - start) / updates
+
+    sockets = [FakeSocket(delay)] + [FakeSocket() for _ in range(players - 1)]
+    connections = [Connection(sock, f"Client {i}") for i, sock in enumerate(sockets)]
+    start = time.perf_counter()
+    for _ in range(updates):
+        for connection in connections:
+            connection.push(parts)
+        time.sleep(delay / 10) # Time between two actions
+    queued = (time.perf_counter() - start) / updates - delay / 10
+    time.sleep(2 * delay)
+    for connection in connections:
+        connection.close()
+    return synchronous, queued, sockets[0].messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=9)
+    parser.add_argument("--hands", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="Seconds the slow client takes to receive a message")
+    args = parser.parse_args()
+
+    app = Flask("app", template_folder="templates") # Root path of the app package
+    app.context_processor(lambda: dict(cos=cos, sin=sin, acos=acos))
+    random.seed(args.seed)
+    rng = random.Random(args.seed)
+    get_tables()
+    table = make_table(0, args.players)
+    clients = {player_id: SimpleNamespace(sent_fragments=None) for player_id in table.players}
+
+    results = {"Whole table": [0.0, 0, 0], "Changed fragments": [0.0, 0, 0]} # Time, bytes, messages
+    actions = 0
+    with app.app_context():
+        for _ in range(args.hands):
+            start_hand(table)
+            while table.current_hand is not None:
+                play_action(table, rng)
+                actions += 1
+                for name, build in (("Whole table", full_table_messages), ("Changed fragments", lambda table: fragment_messages(table, clients))):
+                    start = time.perf_counter()
+                    messages = build(table)
+                    results[name][0] += time.perf_counter() - start
+                    results[name][1] += sum(len(message.encode()) for message in messages)
+                    results[name][2] += len(messages)
+
+    print(f"{actions} actions on a table of {args.players} players")
+    print(f"{'':<20} {'us/action':>10} {'bytes/action':>13} {'messages/action':>16}")
+    for name, (elapsed, sent, messages) in results.items():
+        print(f"{name:<20} {elapsed / actions * 1e6:>10.0f} {sent / actions:>13.0f} {messages / actions:>16.1f}")
+
+    updates = 50
+    synchronous, queued, received = fan_out_latency(args.players, updates, args.slow_delay)
+    print(f"\nBroadcast with one client taking {args.slow_delay * 1000:.0f} ms per message, {updates} updates")
+    print(f"{'Synchronous sends':<20} {synchronous * 1e6:>10.0f} us per broadcast")
+    print(f"{'Queued sends':<20} {queued * 1e6:>10.0f} us per broadcast, the slow client got {received} coalesced messages")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,5 +3,13 @@ SECRET_KEY = 'default-key'
 DATABASE = 'instance/database.db'
 HANDS_DATABASE = 'app/static/Pluribus.db'
 SCHEMA= 'app/utils/schema.sql'
+COMPRESS_OHH_DATA = True # Store imported hands as compressed JSON instead of text
+ALLIN_EV_SAMPLES = 2000 # Deals sampled per preflop all-in to compute the all-in adjusted profits at import
+IMPORT_PRAGMAS = {'journal_mode': 'WAL', 'synchronous': 'OFF'} # Applied to the connections loading hands
+CHARTJS_URL = 'https://unpkg.com/chart.js@4.4.1/dist/chart.umd.js' # Pinned, fetched into app/static/js/chart.umd.js by flask vendor-chartjs, which the statistics page serves
+CHARTJS_INTEGRITY = None # Opt-in CDN : with the sha384-... printed by flask vendor-chartjs, the page loads CHARTJS_URL instead, checked by the browser
+TABLE_MINOR_UNITS = None # Set to 100 to play with integer chips in cents instead of Decimal amounts
+SOCK_SERVER_OPTIONS = {'ping_interval': 25} # WebSockets ping their client every 25 s and close when it doesn't answer
+PRERENDER_PLOTS = 0 # Number of most played players whose statistics plots are rendered in the background by each web process, 0 to disable
 SESSION_COOKIE_SAMESITE = 'Strict'
 SESSION_COOKIE_SECURE = True
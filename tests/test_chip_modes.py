@@ -0,0 +1,94 @@
+"""Decimal and integer chips play the same hands to the same stacks.
+
+The hands are played by the bots of the table simulator, with the same seed in both modes. The only intended
+difference is the odd chips of split pots : integer chips give them to the first winners after the dealer, Decimal
+chips divide the pot to 28 significant digits, which doesn't always give back the pot exactly.
+"""
+import random
+from decimal import Decimal
+import pytest
+from app.poker import Hand, Player
+from app.poker.card import Card
+from app.poker.table import Table, SeatRing
+from app.utils.hand_evaluator import get_tables
+from benchmarks.simulate_tables import STARTING_STACK, make_table, play_action, start_hand
+
+MINOR_UNITS = 100
+HANDS = 300
+PLAYERS = 6
+
+
+def play_hands(minor_units, seed):
+    """Plays HANDS hands, each from the starting stacks. Returns for each hand the stacks in currency, the pots and the chips
+    on the table at its start."""
+    random.seed(seed) # Used by Deck and Table
+    rng = random.Random(seed)
+    table = make_table(0, PLAYERS, minor_units)
+    history = []
+    for _ in range(HANDS):
+        for player in table.players.values():
+            player.stack = table.to_chips(STARTING_STACK)
+            player.status = "Active"
+        chips = start_hand(table)
+        hand = table.current_hand
+        while table.current_hand is not None:
+            play_action(table, rng)
+        history.append(([table.from_chips(player.stack) for player in table.players.values()], hand.pots, chips,
+                        sum(player.stack for player in table.players.values())))
+    return history
+
+
+@pytest.fixture(scope="module", autouse=True)
+def evaluator_tables():
+    get_tables()
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_same_stacks_in_both_modes(seed):
+    odd_chip_hands = 0
+    for (decimal_stacks, decimal_pots, decimal_chips, decimal_end), (integer_stacks, pots, chips, end) in zip(
+            play_hands(None, seed), play_hands(MINOR_UNITS, seed)):
+        # Integer chips never lose or create a chip
+        assert end == chips
+        odd_chip_pots = sum(pot.amount % len(pot.players) != 0 for pot in pots)
+        if not odd_chip_pots:
+            assert decimal_stacks == integer_stacks
+            assert decimal_end == decimal_chips
+            continue
+        # A player gets at most one odd chip per split pot, Decimal chips share it between the winners
+        odd_chip_hands += 1
+        for decimal_stack, integer_stack in zip(decimal_stacks, integer_stacks):
+            assert abs(decimal_stack - integer_stack) < Decimal(odd_chip_pots) / MINOR_UNITS
+        assert abs(decimal_end - decimal_chips) < Decimal("1e-20")
+    assert odd_chip_hands < HANDS // 10
+
+
+def odd_chip_showdown(minor_units):
+    """Three players tie a pot of 3.01 : 1.00 each and 0.01 from a player who folded. The dealer is on seat 0."""
+    table = Table(0, "Odd chips", Decimal("0.5"), Decimal("1"), PLAYERS, minor_units=minor_units)
+    table.verbose = False
+    holes = [["2c", "3d"], ["4c", "5d"], ["2d", "3c"], ["4d", "5c"]]
+    for seat, (cards, contribution) in enumerate(zip(holes, ["1", "1", "1", "0.01"])):
+        stack = table.to_chips(Decimal(100))
+        player = Player(seat, f"Player{seat}", seat, stack, zero=table.zero)
+        player.cards = [Card(card[0], card[1]) for card in cards]
+        player.stack = stack - table.to_chips(Decimal(contribution))
+        table.players[player.id] = player
+    table.hand_players = list(table.players.values())
+    table.active_players = SeatRing(PLAYERS)
+    for player in table.hand_players[:3]:
+        table.active_players.append(player.seat, player)
+    table.board_cards = [Card(card[0], card[1]) for card in ["As", "Ks", "Qs", "Js", "Ts"]] # Everyone plays the board
+    table.dealer_seat = 0
+    table.current_hand = Hand()
+    table.set_winnings()
+    return [table.from_chips(player.stack) for player in table.players.values()]
+
+
+def test_odd_chips():
+    # Integer chips give the odd chip to the first winner after the dealer, and keep every chip
+    assert odd_chip_showdown(MINOR_UNITS) == [Decimal("100"), Decimal("100.01"), Decimal("100"), Decimal("99.99")]
+    # Decimal chips give a third of the pot to each winner, rounded to 28 significant digits
+    decimal_stacks = odd_chip_showdown(None)
+    assert decimal_stacks[:3] == [Decimal(99) + Decimal("3.01") / 3] * 3
+    assert abs(sum(decimal_stacks) - 400) < Decimal("1e-20")
@@ -0,0 +1,70 @@
+"""The single pass side pots of Table.set_winnings give the results of the original implementation.
+
+The scenarios are random multiway all-in showdowns : 2 to 9 players, 1 to 4 bet levels, seeded so a failure can be
+replayed. The original implementation, kept in benchmarks/side_pots.py, only counts the players still in the hand and
+divides split pots, so it is compared without folds and with Decimal chips ; integer chips are compared in currency.
+"""
+import copy
+import random
+from decimal import Decimal
+import pytest
+from app.utils.hand_evaluator import get_tables
+from benchmarks.side_pots import make_showdown, result, set_winnings_original
+
+SCENARIOS = 2000
+MINOR_UNITS = 100
+
+
+def showdown(seed, minor_units=None, folds=False):
+    random.seed(seed) # Used by Deck
+    return make_showdown(random.Random(seed), minor_units, folds)
+
+
+def total_chips(table):
+    return sum(player.stack for player in table.players.values())
+
+
+def starting_chips(table):
+    return sum(player.starting_stack for player in table.players.values())
+
+
+@pytest.fixture(scope="module", autouse=True)
+def evaluator_tables():
+    get_tables()
+
+
+@pytest.mark.parametrize("seed", range(SCENARIOS))
+def test_same_results_as_original(seed):
+    table = showdown(seed)
+    original = copy.deepcopy(table)
+    table.set_winnings()
+    set_winnings_original(original)
+    assert result(table) == result(original)
+
+
+@pytest.mark.parametrize("seed", range(SCENARIOS))
+def test_integer_chips_same_results_as_original(seed):
+    table = showdown(seed, MINOR_UNITS)
+    original = showdown(seed)
+    table.set_winnings()
+    set_winnings_original(original)
+
+    assert total_chips(table) == starting_chips(table)
+    assert [table.from_chips(pot.amount) for pot in table.current_hand.pots] == [pot.amount for pot in original.current_hand.pots]
+    assert [sorted(player.name for player in pot.players) for pot in table.current_hand.pots] == \
+           [sorted(player.name for player in pot.players) for pot in original.current_hand.pots]
+    # Odd chips go to some of the winners instead of being divided : at most one minor unit per split pot
+    odd_chip_pots = sum(pot.amount % len(pot.players) != 0 for pot in table.current_hand.pots)
+    for player, original_player in zip(table.players.values(), original.players.values()):
+        assert abs(table.from_chips(player.stack) - original_player.stack) <= Decimal(odd_chip_pots) / MINOR_UNITS
+        if not odd_chip_pots:
+            assert table.from_chips(player.stack) == original_player.stack
+
+
+@pytest.mark.parametrize("seed", range(SCENARIOS))
+def test_folded_chips_stay_in_the_pots(seed):
+    # The original implementation lost the chips of the players who folded, they now go to the pot of their level
+    table = showdown(seed, MINOR_UNITS, folds=True)
+    table.set_winnings()
+    assert total_chips(table) == starting_chips(table)
+    assert all(player in table.active_players for pot in table.current_hand.pots for player in pot.players)